@@ -1,13 +1,18 @@
 # streamlit_app.py
 
+import os
 import streamlit as st
 import pandas as pd
-import requests, json
-from textstat import flesch_reading_ease
 import statsmodels.api as sm
 from statsmodels.formula.api import ols
 import matplotlib.pyplot as plt
 from io import StringIO
+from factorial_design import FactorialDesign
+from llm_cache import ResponseCache
+from llm_client import (DEFAULT_BASE_URL, TokenBucket, chat_url, completion_text, needs_api_key, run_concurrently,
+                        timing_summary)
+from readability import METRICS, with_results
+from resampling import effect_resampling
 
 
 st.set_page_config(page_title="2³ Factorial Readability Experiment", layout="wide")
@@ -19,6 +24,16 @@ st.sidebar.header("Experiment Settings")
 temps = st.sidebar.selectbox("Temperature levels", options=[(0.2,0.8)], format_func=lambda x: f"{x[0]} / {x[1]}")
 topp_levels = st.sidebar.selectbox("Top-p levels", options=[(0.1,0.9)], format_func=lambda x: f"{x[0]} / {x[1]}")
 r = st.sidebar.slider("Replicates per cell (r)", min_value=2, max_value=8, value=4)
+seed = st.sidebar.number_input("Run-order seed", min_value=0, max_value=1_000_000, value=0, step=1)
+base_url = st.sidebar.text_input("API base URL", value=DEFAULT_BASE_URL)
+concurrency = st.sidebar.slider("Concurrent requests", min_value=1, max_value=16, value=4)
+rate_limit = st.sidebar.number_input("Max requests per second", min_value=0.1, max_value=50.0, value=5.0, step=0.5)
+stream = st.sidebar.checkbox("Stream responses (records time to first token)", value=False)
+response = st.sidebar.selectbox("ANOVA response", list(METRICS) + ["LatencySeconds", "TTFTSeconds", "TokensPerSecond"],
+                                format_func=lambda m: METRICS.get(m, m))
+use_cache = st.sidebar.checkbox("Reuse cached responses", value=True)
+if st.sidebar.button("Clear response cache"):
+    ResponseCache().clear()
 
 run_button = st.sidebar.button("Run Experiment")
 
@@ -27,53 +42,50 @@ if run_button:
     t_low, t_high = temps
     p_low, p_high = topp_levels
 
-    grid = []
-    for T in temps:
-        for P in topp_levels:
-            for rep in range(r):
-                grid.append({"Temperature": T, "TopP": P})
-    df = pd.DataFrame(grid)
+    design = FactorialDesign({"Temperature": temps, "TopP": topp_levels})
+    df = design.runs(r, seed=int(seed))
 
 
-    # 3. Call LLM & compute Flesch
+    # 3. Call LLM & score readability
     st.info("Collecting responses… this may take a few minutes.")
-    flesch_scores = []
     progress_bar = st.progress(0)
-    total = len(df)
-
-    for i, row in df.iterrows():
-        payload = {
+    try:
+        api_key = st.secrets["OPENAI_API_KEY"]
+    except (KeyError, FileNotFoundError):
+        api_key = os.getenv("OPENAI_API_KEY", "")
+    if not api_key and needs_api_key(base_url):
+        st.error("Set OPENAI_API_KEY in .streamlit/secrets.toml, or point the API base URL at a local server.")
+        st.stop()
+    headers = {"Authorization": f"Bearer {api_key}"}
+    base_payload = {
         "model": "gpt-4o-mini",
         "messages": [
             {"role":"system","content":"You are a readability-focused assistant."},
             {"role":"user",  "content":"Explain how factorial experiments help in tuning AI hyperparameters."}
         ],
-        "temperature": float(row["Temperature"]),
-        "top_p":       float(row["TopP"]),
-        # "top_k": float(row["TopK"]),  # include only if using Top-k
         "max_tokens":  200
-        }    
-        headers = {"Authorization": f"Bearer {st.secrets['OPENAI_API_KEY']}"}
-        resp  = requests.post("https://api.openai.com/v1/chat/completions",
-                          headers=headers, json=payload)
-        data = resp .json()
-        # check for errors
-        if not resp .ok or "choices" not in data:
-            st.warning(f"API call failed (status {resp .status_code}): {data.get('error', data)}")
-            text = ""   # or some default/filler
-        else:
-            # safe extraction
-            text = data["choices"][0].get("message", {}).get("content", "")
-
-        #text = r.json()["choices"][0]["message"]["content"]
-        from textstat import flesch_reading_ease
-        flesch_scores.append(flesch_reading_ease(text))
-
-
-        # update progress
-        progress_bar.progress((i + 1) / total)
-
-    df["Flesch"] = flesch_scores
+    }
+    # Runs go out in randomised order; every factor is sent as its API parameter
+    payloads = [design.payload(row, base_payload) for row in df.itertuples()]
+    bucket = TokenBucket(rate_limit)
+    call = lambda payload: completion_text(payload, headers, stream=stream, url=chat_url(base_url), bucket=bucket)
+    cache = ResponseCache(endpoint=chat_url(base_url)) if use_cache else None
+    results = run_concurrently(
+        list(zip(payloads, df["Replicate"])),
+        lambda job: cache.fetch(*job, call) if cache is not None else call(job[0]),
+        max_workers=concurrency,
+        on_progress=lambda done, total: progress_bar.progress(done / total),
+    )
+    if cache is not None:
+        st.caption(f"Response cache: {cache.hits} reused, {cache.misses} fetched")
+        cache.close()
+
+    for text, error, timing in results:
+        if error:
+            st.warning(error)
+    df = with_results(df, results)
+    if timing_summary(df):
+        st.caption(timing_summary(df))
 
 
     # 4. Show raw data & download
@@ -82,13 +94,19 @@ if run_button:
     csv = df.to_csv(index=False)
     st.download_button("Download CSV", data=csv, file_name="readability_data.csv")
 
+    if df[response].isna().all():
+        st.error(f"No {response} values to analyse. Timings need fresh calls "
+                 "(turn off the response cache); TTFT and tokens/sec also need streaming.")
+        st.stop()
+
+    # Permutation p-values and bootstrap CIs, on the numeric factor levels
+    resampled = effect_resampling(design, df, response, 10_000, seed=int(seed))
+
     # 5. Fit 2³ ANOVA
     df["Temperature"] = df["Temperature"].map({t_low:"low", t_high:"high"})
     df["TopP"] = df["TopP"].astype(str)
-    model = ols("Flesch ~ C(Temperature)*C(TopP)", data=df).fit()
-    import matplotlib.pyplot as plt
-    import statsmodels.api as sm
-    
+    model = ols(f"{response} ~ C(Temperature)*C(TopP)", data=df).fit()
+
     # Diagnostic plots
     fig, axes = plt.subplots(1, 2, figsize=(12, 5))
     
@@ -111,6 +129,11 @@ if run_button:
     st.subheader("ANOVA Table")
     st.table(anova_table)
 
+    st.subheader("Permutation & Bootstrap Inference")
+    st.table(resampled)
+    st.caption("10,000 Freedman–Lane permutations and bootstrap resamples of each cell's replicates; "
+               "95% percentile intervals. These do not assume normal residuals.")
+
     fig, axes = plt.subplots(1, 2, figsize=(12, 5))
 
     # (a) Residuals vs. Fitted
@@ -130,7 +153,7 @@ if run_button:
     # 7. Interaction plot
     st.subheader("Interaction: Temperature × TopP")
     fig2, ax2 = plt.subplots()
-    means = df.groupby(["TopP","Temperature"])["Flesch"].mean().unstack()
+    means = df.groupby(["TopP","Temperature"])[response].mean().unstack()
     means.plot(kind="line", marker="o", ax=ax2)
-    ax2.set_ylabel("Mean Flesch Score")
+    ax2.set_ylabel("Mean Flesch Score" if response == "Flesch" else f"Mean {response}")
     st.pyplot(fig2)
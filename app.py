@@ -1,11 +1,30 @@
+import os
+import time
+
 import streamlit as st
-import joblib
+import pandas as pd
 import numpy as np
+import plotly.graph_objects as go
+
+from ipl_cache import cached_model
+from ipl_grid import WinProbabilityGrid
+from ipl_models import MODEL_FILES, registry
+from ipl_pipe import compare_engines, load_pipe_engine, pipe_inputs
+from ipl_predict import (
+    TOTAL_BALLS, WIN_FEATURES, BatsmanRanker, read_match_states, score_win_states, sensitivity_sweep, win_feature_matrix
+)
+from ipl_replay import fast_forward, iter_feed_file, iter_socket_feed, record_features
+from ipl_simulate import simulate_innings
+from ipl_trees import FlatTreeModel
 
-# Load models
-win_model = joblib.load("win_predictor_model.pkl")
-bat_model = joblib.load("batsman_predictor_model.pkl")
-label_encoder = joblib.load("batsman_label_encoder.pkl")
+registry.register("win_grid", "win_grid", loader=WinProbabilityGrid.load)
+registry.register("pipe_engine", "pipe.pkl", loader=load_pipe_engine)
+# IPL_MODEL_FORMAT=flat serves the NumPy tree exports and never imports xgboost
+if os.getenv("IPL_MODEL_FORMAT") == "flat":
+    registry.register("win", "win_predictor_model.npz", loader=FlatTreeModel.load)
+    registry.register("batsman", "batsman_predictor_model.npz", loader=FlatTreeModel.load)
+# Pick up retrained artifacts; this also clears their prediction caches
+registry.reload_changed()
 
 st.title("🏏 IPL Win & Batsman Run Predictor")
 
@@ -15,28 +34,236 @@ st.header("Team Win Probability Predictor")
 current_score = st.number_input("Current Score", value=85)
 balls_left = st.number_input("Balls Left", value=48)
 wickets_left = st.number_input("Wickets Left", value=6)
-run_rate = st.number_input("Current Run Rate", value=7.5)
+# The lookup grid derives the run rate from score and balls left, so it shows that value instead of taking one
+grid_selected = st.session_state.get("use_win_grid", False)
+bowled = TOTAL_BALLS - balls_left
+run_rate = st.number_input(
+    "Current Run Rate",
+    value=float(current_score * 6 / bowled if bowled > 0 else 0.0) if grid_selected else 7.5,
+    disabled=grid_selected,
+)
 required_run_rate = st.number_input("Required Run Rate", value=8.3)
 
+PIPE_ENGINE = "pipe.pkl pipeline (teams & venue, sparse one-hot)"
+win_engine = st.radio("Prediction Engine", ["XGBoost win model", PIPE_ENGINE], horizontal=True)
+if win_engine == PIPE_ENGINE:
+    pipe_categories = registry.get("pipe_engine").categories
+    batting_team = st.selectbox("Batting Team", pipe_categories["batting_team"])
+    bowling_team = st.selectbox("Bowling Team", pipe_categories["bowling_team"], index=1)
+    city = st.selectbox("City", pipe_categories["city"])
+# A grid left behind by a retrain would answer for the old model
+win_grid = registry.get("win_grid") if registry.exists("win_grid") else None
+if win_grid is not None and not win_grid.built_from(os.path.join(registry.base_dir, MODEL_FILES["win"])):
+    st.caption("The lookup grid was built from a different win model; rebuild it with `python ipl_grid.py`.")
+    win_grid = None
+use_grid = win_engine != PIPE_ENGINE and win_grid is not None and st.checkbox(
+    "Use precomputed lookup grid (no XGBoost call; replaces Current Run Rate with the rate implied by score "
+    f"and balls left, for which it is within {win_grid.error['max']:.1e} of the model on sampled chases)",
+    key="use_win_grid",
+)
+
 if st.button("Predict Win Probability"):
     win_input = np.array([[current_score, balls_left, wickets_left, run_rate, required_run_rate]])
-    win_result = win_model.predict_proba(win_input)[0][1]
+    if win_engine == PIPE_ENGINE:
+        pipe_df = pipe_inputs(pd.DataFrame(win_input, columns=WIN_FEATURES), batting_team, bowling_team, city)
+        win_result = registry.get("pipe_engine").predict_proba(pipe_df)[0][1]
+    elif use_grid:
+        win_result = win_grid.predict_proba(win_input)[0]
+    else:
+        win_result = cached_model("win").predict_proba(win_input)[0][1]
     st.success(f"Win Probability: {win_result * 100:.2f}%")
 
+# --- SENSITIVITY SWEEP SECTION ---
+st.header("Sensitivity Sweep")
+st.caption("Win probability as one input varies and the rest stay at the match state above.")
+
+
+@st.cache_data(max_entries=256)
+def cached_sweep(base_state: tuple, feature: str, model_version: float) -> pd.DataFrame:
+    # model_version (the artifact's mtime) keeps curves from a retrained model apart
+    return sensitivity_sweep(registry.get("win"), base_state, feature)
+
+
+sweep_feature = st.selectbox("Input to Vary", WIN_FEATURES, index=WIN_FEATURES.index("required_run_rate"))
+base_state = (current_score, balls_left, wickets_left, run_rate, required_run_rate)
+sweep = cached_sweep(base_state, sweep_feature, os.path.getmtime(registry.path("win")))
+sweep_fig = go.Figure(go.Scatter(x=sweep[sweep_feature], y=sweep["win_probability"], mode="lines"))
+sweep_fig.add_vline(x=base_state[WIN_FEATURES.index(sweep_feature)], line_dash="dash")
+sweep_fig.update_layout(xaxis_title=sweep_feature, yaxis_title="Win Probability", yaxis_range=[0, 1])
+st.plotly_chart(sweep_fig)
+
+# --- INNINGS SIMULATION SECTION ---
+st.header("Monte Carlo Innings Simulator")
+st.caption("Simulates the rest of the chase ball by ball from the match state above.")
+
+default_target = int(current_score + np.ceil(required_run_rate * balls_left / 6))
+target = st.number_input("Target", value=default_target)
+n_rollouts = st.select_slider("Rollouts", options=[1_000, 10_000, 50_000, 100_000], value=10_000)
+n_workers = st.number_input("Worker Processes", min_value=1, max_value=os.cpu_count() or 1, value=os.cpu_count() or 1)
+
+if st.button("Run Simulation"):
+    with st.spinner(f"Simulating {n_rollouts:,} innings…"):
+        sim = simulate_innings(
+            registry.path("win"), int(current_score), int(balls_left), int(wickets_left), int(target),
+            n_rollouts=n_rollouts, n_workers=int(n_workers), loader=registry.loader("win"),
+            win_model=registry.get("win") if n_workers == 1 else None,
+        )
+    st.success(f"Chase succeeded in {sim.win_probability * 100:.1f}% of {sim.n_rollouts:,} simulated innings")
+
+    fan = sim.fan_chart()
+    fan_fig = go.Figure()
+    for low, high, opacity in (("p5", "p95", 0.2), ("p25", "p75", 0.4)):
+        fan_fig.add_trace(go.Scatter(x=fan["ball"], y=fan[high], line=dict(width=0), showlegend=False))
+        fan_fig.add_trace(go.Scatter(
+            x=fan["ball"], y=fan[low], fill="tonexty", line=dict(width=0),
+            fillcolor=f"rgba(31, 119, 180, {opacity})", name=f"{low}–{high}",
+        ))
+    fan_fig.add_trace(go.Scatter(x=fan["ball"], y=fan["p50"], line=dict(color="rgb(31, 119, 180)"), name="median"))
+    fan_fig.update_layout(xaxis_title="Balls Bowled from Now", yaxis_title="Win Probability", yaxis_range=[0, 1])
+    st.plotly_chart(fan_fig)
+
+    score_fig = go.Figure(go.Histogram(x=sim.final_scores))
+    score_fig.add_vline(x=target, line_dash="dash")
+    score_fig.update_layout(xaxis_title="Final Score", yaxis_title="Simulated Innings")
+    st.plotly_chart(score_fig)
+
+# --- BULK WIN PREDICTION SECTION ---
+st.header("Bulk Win Probability Scoring")
+st.caption(
+    f"Upload a CSV or Parquet file with columns: {', '.join(WIN_FEATURES)}. "
+    "The pipe.pkl engine also uses optional target, batting_team, bowling_team and city columns, "
+    "and a 0/1 won column adds accuracy to the engine comparison."
+)
+
+states_file = st.file_uploader("Match States File", type=["csv", "parquet"])
+compare = st.checkbox("Compare XGBoost and pipe.pkl engines on this file")
+
+if states_file is not None:
+    try:
+        states = read_match_states(states_file)
+        if win_engine == PIPE_ENGINE:
+            win_feature_matrix(states)  # validates the shared columns
+            scored = states.copy()
+            scored["win_probability"] = registry.get("pipe_engine").predict_proba(
+                pipe_inputs(states, batting_team, bowling_team, city)
+            )[:, 1]
+        else:
+            scored = score_win_states(registry.get("win"), states)
+        if compare:
+            if win_engine == PIPE_ENGINE:
+                pipe_context = (batting_team, bowling_team, city)
+            else:
+                pipe_categories = registry.get("pipe_engine").categories
+                pipe_context = (pipe_categories["batting_team"][0], pipe_categories["bowling_team"][1], pipe_categories["city"][0])
+            comparison = compare_engines(
+                registry.get("win"), registry.get("pipe_engine"), states, win_feature_matrix(states),
+                pipe_inputs(states, *pipe_context),
+            )
+    except ValueError as e:
+        st.error(f"Could not score file: {e}")
+    else:
+        st.success(f"Scored {len(scored):,} match states with the {win_engine}")
+        if compare:
+            st.subheader("Engine Comparison")
+            st.dataframe(comparison, hide_index=True)
+        st.dataframe(scored.head(100))
+        st.download_button(
+            "Download Scored CSV",
+            data=scored.to_csv(index=False),
+            file_name="win_probabilities.csv",
+            mime="text/csv",
+        )
+
+# --- LIVE MATCH REPLAY SECTION ---
+st.header("Live Match Replay")
+st.caption(
+    "Ball-by-ball feed with current_score, balls_left, wickets_left and either target "
+    "or run_rate and required_run_rate."
+)
+
+feed_source = st.radio("Feed Source", ["File", "Socket"], horizontal=True)
+if feed_source == "File":
+    feed_file = st.file_uploader("Match Feed File", type=["csv", "jsonl", "ndjson"])
+    replay_mode = st.radio("Replay Mode", ["Live", "Fast-forward"], horizontal=True)
+else:
+    feed_file = None
+    feed_host = st.text_input("Feed Host", value="127.0.0.1")
+    feed_port = st.number_input("Feed Port", value=9009, step=1)
+    replay_mode = "Live"
+ball_delay = st.slider("Seconds per Ball (live)", 0.0, 2.0, 0.2) if replay_mode == "Live" else 0.0
+
+if st.button("Start Replay") and (feed_source == "Socket" or feed_file is not None):
+    win_model = registry.get("win")
+    try:
+        if replay_mode == "Fast-forward":
+            start = time.perf_counter()
+            replay = fast_forward(win_model, feed_file)
+            elapsed = time.perf_counter() - start
+            st.line_chart(replay["win_probability"])
+            st.success(f"Replayed {len(replay):,} balls in {elapsed:.3f}s ({len(replay) / max(elapsed, 1e-9):,.0f} balls/s)")
+        else:
+            records = iter_feed_file(feed_file) if feed_file is not None else iter_socket_feed(feed_host, int(feed_port))
+            status = st.empty()
+            # Redraw the worm from the points so far; an innings is at most a few hundred balls
+            worm = st.empty()
+            points = []
+            for ball, record in enumerate(records, start=1):
+                win_prob = win_model.predict_proba(record_features(record))[0, 1]
+                points.append(win_prob)
+                worm.line_chart(pd.DataFrame({"win_probability": points}, index=range(1, ball + 1)))
+                status.metric(
+                    f"Ball {ball}: {record['current_score']}/{10 - int(float(record['wickets_left']))}",
+                    f"{win_prob * 100:.1f}%",
+                )
+                time.sleep(ball_delay)
+    except (KeyError, ValueError) as e:
+        st.error(f"Could not read feed: {e}")
+    except OSError as e:
+        st.error(f"Feed connection failed: {e}")
+
 # --- BATSMAN RUN PREDICTION SECTION ---
 st.header("Batsman Run Predictor")
 
-batsman_name = st.text_input("Batsman Name (case-sensitive, from training data)", value="V Kohli")
+batsman_index = registry.get("batsman_index")
+batsman_query = st.text_input("Search Batsman", value="V Kohli")
+batsman_options = batsman_index.lookup(batsman_query)
+if batsman_query and not batsman_options:
+    st.warning(f"No known batsman matches '{batsman_query}'.")
+batsman_name = st.selectbox("Batsman", options=batsman_options or batsman_index.names)
 balls_faced = st.number_input("Balls Faced", value=20)
 bat_wickets_left = st.number_input("Wickets Left (Team)", value=7)
 bat_run_rate = st.number_input("Current Run Rate", value=8.0)
 bat_req_run_rate = st.number_input("Required Run Rate", value=7.9)
 
 if st.button("Predict Batsman Runs"):
-    try:
-        batsman_encoded = label_encoder.transform([batsman_name])[0]
-        bat_input = np.array([[batsman_encoded, balls_faced, bat_wickets_left, bat_run_rate, bat_req_run_rate]])
-        predicted_runs = bat_model.predict(bat_input)[0]
-        st.success(f"Predicted Runs for {batsman_name}: {predicted_runs:.1f}")
-    except ValueError:
-        st.error("Batsman name not found in training data. Please use a known name.")
+    batsman_encoded = batsman_index.encode(batsman_name)
+    bat_input = np.array([[batsman_encoded, balls_faced, bat_wickets_left, bat_run_rate, bat_req_run_rate]])
+    predicted_runs = cached_model("batsman").predict(bat_input)[0]
+    st.success(f"Predicted Runs for {batsman_name}: {predicted_runs:.1f}")
+
+
+@st.cache_resource
+def batsman_ranker():
+    return BatsmanRanker(registry.get("batsman_index").names)
+
+
+st.subheader("Top Projected Batsmen for this Match State")
+top_k = st.slider("Batsmen to show", min_value=5, max_value=50, value=10)
+st.dataframe(
+    batsman_ranker().rank(
+        registry.get("batsman"), balls_faced, bat_wickets_left, bat_run_rate, bat_req_run_rate, top_k
+    ),
+    hide_index=True,
+)
+
+# --- MODEL REGISTRY STATUS ---
+with st.sidebar.expander("Model Registry"):
+    st.dataframe(pd.DataFrame(registry.stats()), hide_index=True)
+
+with st.sidebar.expander("Prediction Cache"):
+    cache_stats = pd.DataFrame({name: cached_model(name).cache.stats() for name in ("win", "batsman")})
+    st.dataframe(cache_stats)
+    if st.button("Clear Prediction Cache"):
+        for name in ("win", "batsman"):
+            cached_model(name).cache.clear()
+        st.rerun()
@@ -0,0 +1,276 @@
+"""Two-level factorial designs over chat-completion parameters.
+
+    design = FactorialDesign({"Temperature": (0.2, 0.8), "TopP": (0.1, 0.9), "MaxTokens": (100, 300),
+                              "PresencePenalty": (0.0, 1.0)}, fraction=1, blocks=2)
+    runs = design.runs(replicates=3, seed=1)
+    payloads = [design.payload(row, base_payload) for row in runs.itertuples()]
+
+Factors get the letters A, B, C, ... in the order given. A 2^(k-p) fraction
+uses the standard minimum-aberration generators in GENERATORS, so the last p
+factors are generated from the first k-p. The block contrasts are the
+minimum-aberration set: among all choices that leave main effects clear,
+the one confounding the fewest two-factor interactions, then the fewest
+three-factor ones, and so on (2^5 in 4 blocks uses ABC and CDE). Runs are
+randomised within each replicate and block, and payload() sends every
+factor's level as its API parameter.
+"""
+import itertools
+import string
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+from scipy import stats
+
+# Design factor name -> API parameter, value type, allowed range and default levels
+FACTORS = {
+    "Temperature": {"param": "temperature", "type": float, "range": (0.0, 2.0), "levels": (0.2, 0.8), "step": 0.1},
+    "TopP": {"param": "top_p", "type": float, "range": (0.0, 1.0), "levels": (0.1, 0.9), "step": 0.05},
+    "TopK": {"param": "top_k", "type": int, "range": (1, 200), "levels": (10, 100), "step": 1},
+    "MaxTokens": {"param": "max_tokens", "type": int, "range": (16, 1024), "levels": (100, 300), "step": 1},
+    "PresencePenalty": {"param": "presence_penalty", "type": float, "range": (-2.0, 2.0), "levels": (0.0, 1.0),
+                        "step": 0.1},
+    "FrequencyPenalty": {"param": "frequency_penalty", "type": float, "range": (-2.0, 2.0), "levels": (0.0, 1.0),
+                         "step": 0.1},
+    "Seed": {"param": "seed", "type": int, "range": (0, 10_000), "levels": (1, 2), "step": 1},
+}
+# (k, p) -> generators of the minimum-aberration 2^(k-p) fraction (Montgomery, Table 8.14)
+GENERATORS = {
+    (3, 1): ("C=AB",),
+    (4, 1): ("D=ABC",),
+    (5, 1): ("E=ABCD",),
+    (5, 2): ("D=AB", "E=AC"),
+    (6, 1): ("F=ABCDE",),
+    (6, 2): ("E=ABC", "F=BCD"),
+    (6, 3): ("D=AB", "E=AC", "F=BC"),
+    (7, 1): ("G=ABCDEF",),
+    (7, 2): ("F=ABCD", "G=ABDE"),
+    (7, 3): ("E=ABC", "F=BCD", "G=ACD"),
+    (7, 4): ("D=AB", "E=AC", "F=BC", "G=ABC"),
+}
+
+
+def _weight(mask: int) -> int:
+    return bin(mask).count("1")
+
+
+def _mask(word: str) -> int:
+    return sum(1 << string.ascii_uppercase.index(c) for c in word)
+
+
+def _group(words) -> set:
+    """Every product of the given effect words, including the identity (0)"""
+    group = {0}
+    for w in words:
+        group |= {g ^ w for g in group}
+    return group
+
+
+@lru_cache(maxsize=None)
+def _block_generators(k: int, p: int, b: int) -> tuple:
+    """Minimum-aberration b block generators for the 2^(k-p) design in GENERATORS
+
+    Tries every set of b independent alias classes; a set is scored by the
+    sorted orders of the 2^b - 1 effects it confounds with blocks.
+    """
+    if b == 0:
+        return ()
+    defining = _group(_mask(g.replace("=", "")) for g in GENERATORS.get((k, p), ()))
+    # Lowest order in each alias class, keyed by every member
+    order = {m: min(_weight(m ^ d) for d in defining) for m in range(1, 2 ** k) if m not in defining}
+    classes = sorted({min(m ^ d for d in defining) for m in order}, key=lambda m: (_weight(m), m))
+    best, best_score = None, None
+    for words in itertools.combinations(classes, b):
+        contrasts = _group(words) - {0}
+        if len(contrasts) < 2 ** b - 1 or contrasts & defining:
+            continue
+        score = sorted(order[c] for c in contrasts)
+        if score[0] > 1 and (best_score is None or score > best_score):
+            best, best_score = words, score
+    if best is None:
+        raise ValueError(f"Cannot split this design into {2 ** b} blocks without confounding a main effect")
+    return best
+
+
+class FactorialDesign:
+    """A 2^k or 2^(k-p) design, optionally in 2, 4 or 8 blocks"""
+
+    def __init__(self, factors: dict, fraction: int = 0, blocks: int = 1):
+        unknown = set(factors) - set(FACTORS)
+        if unknown:
+            raise ValueError(f"Unknown factors {sorted(unknown)}; choose from {list(FACTORS)}")
+        self.names = list(factors)
+        self.levels = {name: tuple(factors[name]) for name in self.names}
+        self.k, self.p = len(self.names), fraction
+        if self.k < 2:
+            raise ValueError("A factorial design needs at least two factors")
+        if self.p and (self.k, self.p) not in GENERATORS:
+            raise ValueError(f"No 2^({self.k}-{self.p}) design; available: "
+                             f"{sorted(p for k, p in GENERATORS if k == self.k)}")
+        if blocks not in (1, 2, 4, 8) or blocks > 2 ** (self.k - self.p - 1):
+            raise ValueError(f"blocks must be a power of two below the {2 ** (self.k - self.p)} runs")
+        self.blocks = blocks
+
+        self.generators = GENERATORS.get((self.k, self.p), ())
+        # Each generator X=ABC contributes the defining word ABCX
+        self.defining = _group(_mask(g.replace("=", "")) for g in self.generators)
+        self.block_words = list(_block_generators(self.k, self.p, blocks.bit_length() - 1))
+        self.block_group = _group(self.block_words)
+
+    @property
+    def resolution(self):
+        """Length of the shortest defining word; None for a full factorial"""
+        words = [w for w in self.defining if w]
+        return min(map(_weight, words)) if words else None
+
+    @property
+    def n_runs(self) -> int:
+        return 2 ** (self.k - self.p)
+
+    def _aliases(self, mask: int) -> list:
+        return sorted({mask ^ d for d in self.defining}, key=lambda m: (_weight(m), m))
+
+    def effect_name(self, mask: int) -> str:
+        return ":".join(self.names[i] for i in range(self.k) if mask >> i & 1)
+
+    def effects(self) -> list:
+        """One mask per estimable alias class, lowest order first
+
+        Classes confounded with blocks are left out.
+        """
+        block_contrasts = self.block_group - {0}
+        seen, effects = set(), []
+        for mask in sorted(range(1, 2 ** self.k), key=lambda m: (_weight(m), m)):
+            if mask in seen:
+                continue
+            aliases = {mask ^ d for d in self.defining}
+            seen |= aliases
+            if 0 not in aliases and not aliases & block_contrasts:
+                effects.append(mask)
+        return effects
+
+    def alias_table(self, max_order: int = 3) -> pd.DataFrame:
+        """Estimable effects with their aliases up to max_order, plus the block contrasts"""
+        rows = [{"effect": self.effect_name(m),
+                 "aliases": ", ".join(self.effect_name(a) for a in self._aliases(m)[1:] if _weight(a) <= max_order)}
+                for m in self.effects()]
+        for g in sorted(self.block_group - {0}, key=lambda m: (_weight(m), m)):
+            rows.append({"effect": "Block",
+                         "aliases": ", ".join(self.effect_name(a) for a in self._aliases(g) if _weight(a) <= max_order)})
+        return pd.DataFrame(rows)
+
+    def coded(self) -> np.ndarray:
+        """(n_runs, k) matrix of -1/+1 levels in standard order"""
+        base = self.k - self.p
+        runs = np.arange(self.n_runs)
+        X = np.empty((self.n_runs, self.k), dtype=np.int8)
+        for j in range(base):
+            X[:, j] = np.where(runs >> j & 1, 1, -1)
+        for g in self.generators:
+            target, word = g.split("=")
+            X[:, _mask(target).bit_length() - 1] = np.prod([X[:, _mask(c).bit_length() - 1] for c in word], axis=0)
+        return X
+
+    def block_of(self, X: np.ndarray) -> np.ndarray:
+        """1-based block of each coded run"""
+        block = np.zeros(len(X), dtype=np.int64)
+        for i, w in enumerate(self.block_words):
+            sign = np.prod(X[:, [j for j in range(self.k) if w >> j & 1]], axis=1)
+            block |= (sign > 0).astype(np.int64) << i
+        return block + 1
+
+    def runs(self, replicates: int = 1, seed=None, first_replicate: int = 0) -> pd.DataFrame:
+        """Every run of every replicate, in randomised run order
+
+        Blocks are run in random order within a replicate, and runs in
+        random order within a block. Each replicate's order depends only on
+        the seed and its index, so replicates can be generated a round at a
+        time (first_replicate) and match a design generated all at once.
+        """
+        X = self.coded()
+        block = self.block_of(X)
+        order = []
+        for rep in range(first_replicate, first_replicate + replicates):
+            rng = np.random.default_rng(None if seed is None else [int(seed), rep])
+            for b in rng.permutation(np.unique(block)):
+                order.extend((rep, i) for i in rng.permutation(np.flatnonzero(block == b)))
+
+        rows = []
+        for run, (rep, i) in enumerate(order, start=first_replicate * self.n_runs + 1):
+            row = {"RunOrder": run, "StdOrder": i + 1, "Replicate": rep, "Block": int(block[i])}
+            for j, name in enumerate(self.names):
+                low, high = self.levels[name]
+                row[name] = FACTORS[name]["type"](high if X[i, j] > 0 else low)
+            rows.append(row)
+        return pd.DataFrame(rows)
+
+    def coded_frame(self, df: pd.DataFrame) -> pd.DataFrame:
+        """df with every factor column replaced by its -1/+1 coding"""
+        coded = df.copy()
+        for name in self.names:
+            high = float(self.levels[name][1])
+            coded[name] = np.where(np.asarray(df[name], dtype=float) == high, 1.0, -1.0)
+        return coded
+
+    def model_matrix(self, df: pd.DataFrame) -> tuple:
+        """(X, effect masks) for the runs in df: intercept, block dummies, then one -1/+1 column per effect"""
+        coded = self.coded_frame(df)[self.names].to_numpy()
+        columns = [np.ones(len(df))]
+        columns += [(df["Block"].to_numpy() == b).astype(float) for b in range(2, self.blocks + 1)]
+        masks = self.effects()
+        for mask in masks:
+            columns.append(np.prod(coded[:, [j for j in range(self.k) if mask >> j & 1]], axis=1))
+        return np.column_stack(columns), masks
+
+    def effect_intervals(self, df: pd.DataFrame, response: str, confidence: float = 0.95) -> pd.DataFrame:
+        """Each effect (mean at high minus mean at low) with its t confidence interval
+
+        Runs with a missing response are left out. Intervals are infinite
+        until there are residual degrees of freedom, i.e. for a single
+        replicate of a saturated design.
+        """
+        df = df[np.isfinite(df[response].to_numpy(dtype=float))]
+        X, masks = self.model_matrix(df)
+        y = df[response].to_numpy(dtype=float)
+        beta, _, rank, _ = np.linalg.lstsq(X, y, rcond=None)
+        dof = len(y) - rank
+        if dof > 0:
+            sigma2 = np.sum((y - X @ beta) ** 2) / dof
+            se = np.sqrt(sigma2 * np.diag(np.linalg.pinv(X.T @ X)))
+            t = stats.t.ppf(0.5 + confidence / 2, dof)
+        else:
+            se, t = np.full(len(beta), np.inf), np.inf
+        # A +/-1 coded coefficient is half the effect
+        first = X.shape[1] - len(masks)
+        estimate, half_width = 2 * beta[first:], 2 * t * se[first:]
+        return pd.DataFrame({
+            "effect": [self.effect_name(m) for m in masks],
+            "estimate": estimate,
+            "ci_low": estimate - half_width,
+            "ci_high": estimate + half_width,
+            "half_width": half_width,
+            "df": dof,
+        })
+
+    def formula(self, response: str) -> str:
+        """Model formula with blocks and every estimable effect, to fit to coded_frame(df)
+
+        Effects are products of the -1/+1 factor columns. Categorical terms
+        would break when blocks are confounded with an interaction that a
+        higher-order term still contains.
+        """
+        terms = ["C(Block)"] if self.blocks > 1 else []
+        terms += [self.effect_name(mask) for mask in self.effects()]
+        return f"{response} ~ " + " + ".join(terms)
+
+    def payload(self, row, base: dict) -> dict:
+        """Request payload with every factor's level set as its API parameter"""
+        payload = dict(base)
+        for name in self.names:
+            value = row[name] if isinstance(row, (dict, pd.Series)) else getattr(row, name)
+            payload[FACTORS[name]["param"]] = FACTORS[name]["type"](value)
+        return payload
+
+
+def available_fractions(k: int) -> list:
+    return [0] + sorted(p for kk, p in GENERATORS if kk == k)
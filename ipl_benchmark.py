@@ -0,0 +1,180 @@
+"""Inference benchmarks for the shipped IPL model artifacts.
+
+    python ipl_benchmark.py --out bench_results.json
+
+Each model is measured in a fresh interpreter so cold-load time includes the
+library imports and peak RSS belongs to that model alone. Results are
+written as JSON, keyed by model, together with artifact checksums and
+library versions so runs can be compared after a retrain.
+"""
+import argparse
+import hashlib
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import time
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# name -> (artifact, how to load it)
+MODELS = {
+    "win": ("win_predictor_model.pkl", "joblib"),
+    "batsman": ("batsman_predictor_model.pkl", "joblib"),
+    "pipe": ("pipe.pkl", "joblib"),
+    "win_flat": ("win_predictor_model.npz", "flat"),
+    "batsman_flat": ("batsman_predictor_model.npz", "flat"),
+}
+BATCH_SIZES = (1, 10, 100, 1_000, 10_000, 100_000)
+
+
+def _load(path: str, kind: str):
+    if kind == "flat":
+        from ipl_trees import FlatTreeModel
+        return FlatTreeModel.load(path)
+    import joblib
+    return joblib.load(path)
+
+
+def _make_inputs(name: str, model, n: int, rng):
+    """Random but plausible inputs for a model, as it expects them"""
+    import numpy as np
+    import pandas as pd
+
+    balls_left = rng.integers(1, 120, n)
+    wickets_left = rng.integers(0, 11, n)
+    run_rate = rng.uniform(3, 12, n)
+    required_run_rate = rng.uniform(3, 15, n)
+
+    if name == "pipe":
+        encoder = model.steps[0][1].named_transformers_["cat"]
+        target = rng.integers(120, 230, n)
+        score = (target * rng.uniform(0, 1, n)).astype(int)
+        return pd.DataFrame({
+            "batting_team": rng.choice(encoder.categories_[0], n),
+            "bowling_team": rng.choice(encoder.categories_[1], n),
+            "city": rng.choice(encoder.categories_[2], n),
+            "runs_left": target - score,
+            "balls_left": balls_left,
+            "wickets_left": wickets_left,
+            "total_runs_x": target,
+            "cur_run_rate": run_rate,
+            "req_run_rate": required_run_rate,
+        })
+    first = rng.integers(0, 390, n) if name.startswith("batsman") else rng.integers(0, 220, n)
+    return np.column_stack([first, balls_left, wickets_left, run_rate, required_run_rate]).astype(np.float32)
+
+
+def _predict_fn(name: str, model):
+    if name.startswith("batsman"):
+        return model.predict
+    return model.predict_proba
+
+
+def _peak_rss_mb() -> float:
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports KiB, macOS bytes
+    return peak / 1e6 if sys.platform == "darwin" else peak / 1e3
+
+
+def run_worker(name: str, latency_repeats: int, min_seconds: float) -> dict:
+    """Benchmark one model inside this (fresh) process"""
+    start = time.perf_counter()
+    path, kind = MODELS[name]
+    model = _load(os.path.join(BASE_DIR, path), kind)
+    load_seconds = time.perf_counter() - start
+
+    import numpy as np
+
+    rng = np.random.default_rng(0)
+    predict = _predict_fn(name, model)
+
+    row = _make_inputs(name, model, 1, rng)
+    predict(row)  # warm-up
+    timings = np.empty(latency_repeats)
+    for i in range(latency_repeats):
+        t = time.perf_counter()
+        predict(row)
+        timings[i] = time.perf_counter() - t
+
+    throughput = {}
+    for size in BATCH_SIZES:
+        X = _make_inputs(name, model, size, rng)
+        calls, t = 0, time.perf_counter()
+        while True:
+            predict(X)
+            calls += 1
+            elapsed = time.perf_counter() - t
+            if elapsed >= min_seconds:
+                break
+        throughput[str(size)] = calls * size / elapsed
+
+    return {
+        "cold_load_seconds": load_seconds,
+        "latency_p50_ms": float(np.percentile(timings, 50) * 1e3),
+        "latency_p99_ms": float(np.percentile(timings, 99) * 1e3),
+        "rows_per_second": throughput,
+        "peak_rss_mb": _peak_rss_mb(),
+    }
+
+
+def sha256_file(path: str) -> str:
+    """Hex SHA-256 of a file, read in 1MB blocks"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _versions() -> dict:
+    versions = {"python": platform.python_version()}
+    for module in ("numpy", "pandas", "sklearn", "xgboost", "joblib"):
+        try:
+            versions[module] = __import__(module).__version__
+        except ImportError:
+            versions[module] = None
+    return versions
+
+
+def run_benchmarks(names, latency_repeats: int = 1000, min_seconds: float = 1.0) -> dict:
+    results = {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "platform": platform.platform(),
+        "versions": _versions(),
+        "models": {},
+    }
+    for name in names:
+        out = subprocess.run(
+            [sys.executable, "-W", "ignore", __file__, "--worker", name,
+             "--latency-repeats", str(latency_repeats), "--min-seconds", str(min_seconds)],
+            capture_output=True, text=True, check=True, cwd=BASE_DIR,
+        )
+        result = json.loads(out.stdout.strip().splitlines()[-1])
+        result["artifact"] = MODELS[name][0]
+        result["sha256"] = sha256_file(os.path.join(BASE_DIR, MODELS[name][0]))
+        results["models"][name] = result
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the IPL model artifacts")
+    parser.add_argument("--models", nargs="+", default=list(MODELS), choices=list(MODELS))
+    parser.add_argument("--latency-repeats", type=int, default=1000)
+    parser.add_argument("--min-seconds", type=float, default=1.0, help="minimum timing per batch size")
+    parser.add_argument("--out", help="write JSON results here instead of stdout")
+    parser.add_argument("--worker", choices=list(MODELS), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        print(json.dumps(run_worker(args.worker, args.latency_repeats, args.min_seconds)))
+        sys.exit(0)
+
+    results = run_benchmarks(args.models, args.latency_repeats, args.min_seconds)
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(results, f, indent=2)
+    else:
+        print(json.dumps(results, indent=2))
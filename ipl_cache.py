@@ -0,0 +1,113 @@
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+from ipl_models import registry
+
+# Rounding applied to each of the five model inputs before caching:
+# counts (score/encoded batsman, balls, wickets) exactly, run rates to 2 dp
+DEFAULT_DECIMALS = (0, 0, 0, 2, 2)
+
+
+class PredictionCache:
+    """Bounded LRU cache with TTL for per-row predictions keyed on rounded inputs"""
+
+    def __init__(self, maxsize: int = 10_000, ttl_seconds: float = 3600, decimals=DEFAULT_DECIMALS):
+        self.maxsize = maxsize
+        self.ttl_seconds = ttl_seconds
+        self.decimals = np.asarray(decimals)
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def quantize(self, X) -> np.ndarray:
+        X = np.atleast_2d(np.asarray(X, dtype=np.float64))
+        scale = 10.0 ** self.decimals
+        return np.round(X * scale) / scale
+
+    def lookup(self, X, compute_fn, method: str = "") -> np.ndarray:
+        """Per-row results for X, calling compute_fn once on the rows not cached"""
+        Q = self.quantize(X)
+        keys = [(method, *row) for row in Q.tolist()]
+        results = np.empty(len(keys))
+        missing = []
+        now = time.monotonic()
+
+        with self._lock:
+            for i, key in enumerate(keys):
+                entry = self._entries.get(key)
+                if entry is not None and now - entry[1] <= self.ttl_seconds:
+                    self._entries.move_to_end(key)
+                    results[i] = entry[0]
+                    self.hits += 1
+                else:
+                    missing.append(i)
+                    self.misses += 1
+
+        if missing:
+            # Computed on the rounded inputs so every key maps to one answer
+            computed = np.asarray(compute_fn(Q[missing]), dtype=np.float64)
+            results[missing] = computed
+            with self._lock:
+                for i, value in zip(missing, computed):
+                    self._entries[keys[i]] = (float(value), now)
+                    self._entries.move_to_end(keys[i])
+                while len(self._entries) > self.maxsize:
+                    self._entries.popitem(last=False)
+                    self.evictions += 1
+        return results
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
+
+
+class CachedModel:
+    """predict/predict_proba front end for a registry model backed by a PredictionCache"""
+
+    def __init__(self, name: str, cache: PredictionCache, model_registry=registry):
+        self.name = name
+        self.cache = cache
+        self.registry = model_registry
+
+    def predict_proba(self, X) -> np.ndarray:
+        model = self.registry.get(self.name)
+        p = self.cache.lookup(X, lambda Q: model.predict_proba(Q)[:, 1], method="predict_proba")
+        return np.column_stack([1.0 - p, p])
+
+    def predict(self, X) -> np.ndarray:
+        return self.cache.lookup(X, self.registry.get(self.name).predict, method="predict")
+
+
+_cached_models = {}
+_cached_models_lock = threading.Lock()
+
+
+def cached_model(name: str, **cache_kwargs) -> CachedModel:
+    """Process-wide cached front end for a registry model, cleared when it is invalidated"""
+    with _cached_models_lock:
+        if name not in _cached_models:
+            _cached_models[name] = CachedModel(name, PredictionCache(**cache_kwargs))
+        return _cached_models[name]
+
+
+def _clear_on_invalidate(name: str):
+    if name in _cached_models:
+        _cached_models[name].cache.clear()
+
+
+registry.add_invalidation_hook(_clear_on_invalidate)
@@ -0,0 +1,171 @@
+"""Precomputed win-probability lookup grid.
+
+Build once offline:
+
+    python ipl_grid.py --out win_grid
+
+then answer queries by a lookup in the memory-mapped table instead of
+calling the XGBoost model. The win model is a tree ensemble, so it is
+constant between the split thresholds it uses: the grid puts its points on
+every integer score and ball count and on the model's own
+required_run_rate and wickets_left thresholds, which makes the lookup
+exact rather than interpolated. run_rate follows from current_score and
+balls_left, so it is derived rather than gridded. Every build is checked
+against the model on sampled chase states and refused if the lookup error
+exceeds the tolerance; the measured error and the model file's sha256 are
+kept in axes.json, so a grid left behind by a retrain can be recognised.
+"""
+import argparse
+import json
+import os
+
+import numpy as np
+
+from ipl_benchmark import sha256_file
+from ipl_predict import TOTAL_BALLS, WIN_FEATURES, chase_features
+
+# Gridded inputs, in table order; run_rate is derived from score and balls left
+GRID_FEATURES = ["current_score", "balls_left", "wickets_left", "required_run_rate"]
+# Highest score on the grid; run_rate is derived from score and balls left, so both axes keep every integer
+MAX_SCORE = 300
+DEFAULT_TOLERANCE = 1e-3
+
+
+def split_axes(win_model) -> dict:
+    """Grid points per gridded feature: every score and ball count, and the model's thresholds for the rest
+
+    A state belongs to the grid point at or below it on each axis, matching
+    the trees' `x < threshold` splits.
+    """
+    trees = win_model.get_booster().trees_to_dataframe()
+    axes = {
+        "current_score": np.arange(MAX_SCORE + 1, dtype=np.float32),
+        "balls_left": np.arange(TOTAL_BALLS + 1, dtype=np.float32),
+    }
+    for name in ("wickets_left", "required_run_rate"):
+        thresholds = trees.loc[trees.Feature == name, "Split"].to_numpy(dtype=np.float32)
+        axes[name] = np.unique(np.concatenate([[0], thresholds[thresholds > 0]])).astype(np.float32)
+    return axes
+
+
+def _with_run_rate(G: np.ndarray) -> np.ndarray:
+    """Win-model inputs (n, 5) for rows of gridded inputs (n, 4)"""
+    score, balls_left, wickets_left, required = np.asarray(G, dtype=np.float64).T
+    bowled = TOTAL_BALLS - balls_left
+    run_rate = np.divide(score * 6, bowled, out=np.zeros_like(score), where=bowled > 0)
+    return np.column_stack([score, balls_left, wickets_left, run_rate, required]).astype(np.float32)
+
+
+def sample_chase_states(n: int, seed: int = 0) -> np.ndarray:
+    """Plausible chase states (n, 5): targets of 120-230, scores near par, wickets falling with overs"""
+    rng = np.random.default_rng(seed)
+    target = rng.integers(120, 231, n)
+    balls_left = rng.integers(1, TOTAL_BALLS, n)
+    bowled = TOTAL_BALLS - balls_left
+    score = np.clip(np.rint(target * bowled / TOTAL_BALLS * rng.uniform(0.6, 1.25, n)), 0, target - 1)
+    wickets_left = 10 - rng.binomial(10, np.clip(bowled / TOTAL_BALLS * rng.uniform(0.2, 1.0, n), 0, 1))
+    return chase_features(score, balls_left, wickets_left, target)
+
+
+def grid_error(win_model, grid: "WinProbabilityGrid", X: np.ndarray) -> dict:
+    """Absolute difference between grid and model win probabilities on the rows of X"""
+    diff = np.abs(grid.predict_proba(X) - win_model.predict_proba(X)[:, 1])
+    return {"mean": float(diff.mean()), "p95": float(np.quantile(diff, 0.95)),
+            "p99": float(np.quantile(diff, 0.99)), "max": float(diff.max())}
+
+
+def build_grid(win_model, out_dir: str, axes=None, chunk_size: int = 500_000, samples: int = 20_000,
+               tolerance: float = DEFAULT_TOLERANCE, seed: int = 0, model_sha256: str = None) -> dict:
+    """Evaluate the win model at every grid point, verify it and save the table to out_dir
+
+    Returns the lookup error on sampled chase states. Raises ValueError,
+    leaving no table behind, when the largest error exceeds tolerance.
+    model_sha256, of the model's file, is recorded with it.
+    """
+    axes = axes or split_axes(win_model)
+    points = [np.asarray(axes[name], dtype=np.float32) for name in GRID_FEATURES]
+    shape = tuple(len(p) for p in points)
+    os.makedirs(out_dir, exist_ok=True)
+    values_path = os.path.join(out_dir, "values.npy")
+    axes_path = os.path.join(out_dir, "axes.json")
+
+    values = np.lib.format.open_memmap(values_path, mode="w+", dtype=np.float32, shape=shape)
+    flat = values.reshape(-1)
+    for start in range(0, flat.size, chunk_size):
+        idx = np.unravel_index(np.arange(start, min(start + chunk_size, flat.size)), shape)
+        G = np.column_stack([p[i] for p, i in zip(points, idx)])
+        flat[start:start + len(G)] = win_model.predict_proba(_with_run_rate(G))[:, 1]
+    values.flush()
+
+    grid = WinProbabilityGrid(values, points)
+    error = grid_error(win_model, grid, sample_chase_states(samples, seed))
+    del grid, values, flat
+    if error["max"] > tolerance:
+        for path in (values_path, axes_path):
+            if os.path.exists(path):
+                os.remove(path)
+        raise ValueError(f"Grid differs from the model by up to {error['max']:.2e} "
+                         f"(p99 {error['p99']:.2e}), above tolerance {tolerance}")
+
+    with open(axes_path, "w") as f:
+        json.dump({"axes": {name: p.tolist() for name, p in zip(GRID_FEATURES, points)}, "error": error,
+                   "model_sha256": model_sha256}, f)
+    return error
+
+
+class WinProbabilityGrid:
+    """Memory-mapped win-probability table answering queries by lookup
+
+    Queries are win-model rows (n, 5); their run_rate column is ignored
+    because the table derives it from score and balls left. Inputs outside
+    the grid are clipped to its edges.
+    """
+
+    def __init__(self, values: np.ndarray, axes: list, error: dict = None, model_sha256: str = None):
+        self.values = values
+        self.model_sha256 = model_sha256
+        self.axes = [np.asarray(a, dtype=np.float32) for a in axes]
+        self.error = error or {}
+        self._columns = [WIN_FEATURES.index(name) for name in GRID_FEATURES]
+        self._flat = values.reshape(-1)
+        self._strides = np.array([s // values.itemsize for s in values.strides])
+
+    @classmethod
+    def load(cls, grid_dir: str) -> "WinProbabilityGrid":
+        with open(os.path.join(grid_dir, "axes.json")) as f:
+            meta = json.load(f)
+        if "error" not in meta:
+            raise ValueError(f"{grid_dir} was built by an older ipl_grid.py; rebuild it")
+        values = np.load(os.path.join(grid_dir, "values.npy"), mmap_mode="r")
+        return cls(values, [meta["axes"][name] for name in GRID_FEATURES], meta["error"], meta.get("model_sha256"))
+
+    def built_from(self, model_path: str) -> bool:
+        """Whether the table was computed from this model file"""
+        return self.model_sha256 is not None and self.model_sha256 == sha256_file(model_path)
+
+    def predict_proba(self, X) -> np.ndarray:
+        """Win probability for each row of X (n, 5)"""
+        G = np.atleast_2d(np.asarray(X, dtype=np.float32))[:, self._columns]
+        index = np.column_stack([
+            np.clip(np.searchsorted(axis, G[:, j], side="right") - 1, 0, len(axis) - 1)
+            for j, axis in enumerate(self.axes)
+        ])
+        return self._flat[index @ self._strides].astype(np.float64)
+
+
+if __name__ == "__main__":
+    import joblib
+
+    parser = argparse.ArgumentParser(description="Build the win-probability lookup grid")
+    parser.add_argument("--model", default="win_predictor_model.pkl")
+    parser.add_argument("--out", default="win_grid")
+    parser.add_argument("--samples", type=int, default=20_000, help="chase states used to verify the grid")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE, help="largest allowed absolute error")
+    args = parser.parse_args()
+
+    try:
+        error = build_grid(joblib.load(args.model), args.out, samples=args.samples, tolerance=args.tolerance,
+                           model_sha256=sha256_file(args.model))
+    except ValueError as e:
+        raise SystemExit(f"{e}; not writing {args.out}")
+    print(f"Wrote {args.out}/values.npy and {args.out}/axes.json (max error {error['max']:.2e} on {args.samples} states)")
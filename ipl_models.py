@@ -0,0 +1,152 @@
+import os
+import threading
+import time
+
+import joblib
+
+from ipl_names import load_batsman_index
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Artifacts the IPL app knows how to load, by registry name
+MODEL_FILES = {
+    "win": "win_predictor_model.pkl",
+    "batsman": "batsman_predictor_model.pkl",
+    "label_encoder": "batsman_label_encoder.pkl",
+}
+
+
+def _rss_bytes():
+    """Current resident set size of this process, or None if unavailable"""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def _disk_bytes(path: str) -> int:
+    """Size of a file, or the total size of a directory artifact"""
+    if not os.path.isdir(path):
+        return os.path.getsize(path)
+    return sum(
+        os.path.getsize(os.path.join(root, name))
+        for root, _, names in os.walk(path)
+        for name in names
+    )
+
+
+def _modified_time(path: str) -> float:
+    """Latest modification time of a file or of any file in a directory artifact"""
+    if not os.path.isdir(path):
+        return os.path.getmtime(path)
+    return max(
+        (os.path.getmtime(os.path.join(root, name)) for root, _, names in os.walk(path) for name in names),
+        default=os.path.getmtime(path),
+    )
+
+
+class ModelRegistry:
+    """Process-wide store that loads each model artifact once, on first use"""
+
+    def __init__(self, files=None, base_dir: str = BASE_DIR):
+        self.base_dir = base_dir
+        self._files = dict(MODEL_FILES if files is None else files)
+        self._loaders = {}
+        self._models = {}
+        self._stats = {}
+        self._mtimes = {}
+        self._invalidation_hooks = []
+        self._lock = threading.Lock()
+
+    def register(self, name: str, filename: str, loader=None):
+        """Add or replace a model; re-registering the same spec is a no-op"""
+        loader = loader or joblib.load
+        with self._lock:
+            if self._files.get(name) == filename and self._loaders.get(name, joblib.load) == loader:
+                return
+            self._files[name] = filename
+            self._loaders[name] = loader
+        self.invalidate(name)
+
+    def add_invalidation_hook(self, hook):
+        """Call hook(name) whenever a model is dropped so derived caches can clear"""
+        self._invalidation_hooks.append(hook)
+
+    def invalidate(self, name: str = None):
+        """Forget a loaded model (or all of them); the next get() reloads from disk"""
+        names = list(self._files) if name is None else [name]
+        with self._lock:
+            for n in names:
+                self._models.pop(n, None)
+                self._stats.pop(n, None)
+                self._mtimes.pop(n, None)
+        for n in names:
+            for hook in self._invalidation_hooks:
+                hook(n)
+
+    def reload_changed(self) -> list:
+        """Invalidate loaded models whose artifact changed on disk since loading"""
+        changed = [
+            name for name, mtime in list(self._mtimes.items())
+            if not self.exists(name) or _modified_time(self.path(name)) != mtime
+        ]
+        for name in changed:
+            self.invalidate(name)
+        return changed
+
+    def path(self, name: str) -> str:
+        if name not in self._files:
+            raise KeyError(f"Unknown model '{name}'. Known models: {', '.join(self._files)}")
+        return os.path.join(self.base_dir, self._files[name])
+
+    def loader(self, name: str):
+        return self._loaders.get(name, joblib.load)
+
+    def exists(self, name: str) -> bool:
+        return os.path.exists(self.path(name))
+
+    def get(self, name: str):
+        model = self._models.get(name)
+        if model is not None:
+            return model
+        with self._lock:
+            if name not in self._models:
+                self._load(name)
+            return self._models[name]
+
+    def _load(self, name: str):
+        path = self.path(name)
+        rss_before = _rss_bytes()
+        start = time.perf_counter()
+        model = self.loader(name)(path)
+        load_seconds = time.perf_counter() - start
+        rss_after = _rss_bytes()
+
+        self._models[name] = model
+        self._mtimes[name] = _modified_time(path)
+        self._stats[name] = {
+            "load_seconds": load_seconds,
+            "rss_delta_bytes": None if rss_before is None else rss_after - rss_before,
+            "file_bytes": _disk_bytes(path),
+        }
+
+    def stats(self) -> list:
+        """Load time and memory for every registered model, loaded or not"""
+        rows = []
+        for name in self._files:
+            stats = self._stats.get(name, {})
+            rows.append({
+                "model": name,
+                "file": self._files[name],
+                "loaded": name in self._models,
+                "load_seconds": stats.get("load_seconds"),
+                "rss_delta_mb": None if stats.get("rss_delta_bytes") is None else stats["rss_delta_bytes"] / 1e6,
+                "file_mb": stats["file_bytes"] / 1e6 if stats else None,
+            })
+        return rows
+
+
+# Shared by every Streamlit session in this process
+registry = ModelRegistry()
+registry.register("batsman_index", MODEL_FILES["label_encoder"], loader=load_batsman_index)
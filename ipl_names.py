@@ -0,0 +1,93 @@
+import bisect
+import difflib
+import re
+import unicodedata
+from collections import defaultdict
+
+import joblib
+
+
+def normalize_name(name: str) -> str:
+    """Case-, accent- and punctuation-insensitive form of a player name"""
+    name = unicodedata.normalize("NFKD", str(name))
+    name = "".join(ch for ch in name if not unicodedata.combining(ch))
+    name = re.sub(r"[.'`]", "", name.casefold())
+    return " ".join(re.sub(r"[^0-9a-z]+", " ", name).split())
+
+
+class BatsmanIndex:
+    """Name lookups over the label encoder's classes without exception handling"""
+
+    def __init__(self, classes):
+        self.names = [str(name) for name in classes]
+        # LabelEncoder codes are positions in its sorted classes_
+        self._codes = {name: code for code, name in enumerate(self.names)}
+        self._normalized = {}
+        self._tokens = defaultdict(list)
+        for name in self.names:
+            key = normalize_name(name)
+            self._normalized.setdefault(key, name)
+            for token in key.split():
+                self._tokens[token].append(name)
+        self._keys = sorted(self._normalized)
+
+    @classmethod
+    def from_encoder(cls, label_encoder) -> "BatsmanIndex":
+        return cls(label_encoder.classes_)
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._codes
+
+    def encode(self, name: str):
+        """Label-encoder code for an exact known name, or None"""
+        return self._codes.get(name)
+
+    def resolve(self, query: str):
+        """Best known name for a query: exact, normalized, then a unique surname match"""
+        if query in self._codes:
+            return query
+        key = normalize_name(query)
+        if key in self._normalized:
+            return self._normalized[key]
+        tokens = key.split()
+        if tokens and len(self._tokens.get(tokens[-1], [])) == 1:
+            return self._tokens[tokens[-1]][0]
+        return None
+
+    def complete(self, prefix: str, limit: int = 10) -> list:
+        """Known names whose normalized form starts with prefix, via binary search"""
+        key = normalize_name(prefix)
+        start = bisect.bisect_left(self._keys, key)
+        matches = []
+        for candidate in self._keys[start:start + limit]:
+            if not candidate.startswith(key):
+                break
+            matches.append(self._normalized[candidate])
+        return matches
+
+    def suggest(self, query: str, limit: int = 5) -> list:
+        """Near-miss candidates for a query that did not resolve"""
+        key = normalize_name(query)
+        # Players sharing any name token are the likely intended ones
+        candidates = {normalize_name(n) for token in key.split() for n in self._tokens.get(token, [])}
+        matches = difflib.get_close_matches(key, candidates or self._keys, n=limit, cutoff=0.5)
+        if not matches and candidates:
+            matches = difflib.get_close_matches(key, self._keys, n=limit, cutoff=0.6)
+        return [self._normalized[m] for m in matches]
+
+    def lookup(self, query: str, limit: int = 10) -> list:
+        """Typeahead options for a query: resolved name first, then completions or suggestions"""
+        resolved = self.resolve(query)
+        options = [resolved] if resolved else []
+        for name in self.complete(query, limit) or self.suggest(query, limit):
+            if name not in options:
+                options.append(name)
+        return options[:limit]
+
+
+def load_batsman_index(path: str) -> BatsmanIndex:
+    """Registry loader building the index straight from the label encoder pickle"""
+    return BatsmanIndex.from_encoder(joblib.load(path))
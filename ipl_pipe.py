@@ -0,0 +1,122 @@
+"""pipe.pkl (ColumnTransformer one-hot + XGBClassifier) as a sparse-input engine.
+
+The pipeline's encoder emits dense one-hot columns, and its booster was
+trained on them. In a CSR matrix XGBoost treats absent entries as missing
+rather than zero, so feeding sparse input to that booster as-is would change
+its predictions. PipeEngine therefore uses a copy of the booster whose
+missing-value direction at every split is the direction 0 takes, which makes
+sparse and dense input give identical results for inputs without NaNs.
+"""
+import copy
+import json
+import time
+
+import numpy as np
+import pandas as pd
+import scipy.sparse as sp
+
+
+class PipeEngine:
+    """Scores pipe.pkl inputs through a sparse one-hot matrix"""
+
+    def __init__(self, pipe):
+        import xgboost
+
+        transformer = pipe.steps[0][1]
+        self.pipe = pipe
+        self.encoder = copy.copy(transformer.named_transformers_["cat"])
+        self.encoder.sparse_output = True
+        self.categorical_columns = list(transformer.transformers_[0][2])
+        self.numeric_columns = list(transformer.transformers_[1][2])
+        self.booster = _zero_as_missing(pipe.steps[-1][1].get_booster(), xgboost)
+
+    @property
+    def categories(self) -> dict:
+        return dict(zip(self.categorical_columns, (list(c) for c in self.encoder.categories_)))
+
+    def transform(self, df: pd.DataFrame) -> sp.csr_matrix:
+        onehot = self.encoder.transform(df[self.categorical_columns])
+        numeric = sp.csr_matrix(df[self.numeric_columns].to_numpy(dtype=np.float32))
+        return sp.hstack([onehot, numeric], format="csr", dtype=np.float32)
+
+    def predict_proba(self, df: pd.DataFrame) -> np.ndarray:
+        p = self.booster.inplace_predict(self.transform(df))
+        return np.column_stack([1.0 - p, p])
+
+
+def _zero_as_missing(booster, xgboost):
+    """Copy of a booster that sends missing values wherever 0 would go"""
+    model = json.loads(booster.save_raw(raw_format="json"))
+    for tree in model["learner"]["gradient_booster"]["model"]["trees"]:
+        # XGBoost goes left when x < split_condition, so 0 goes left iff the threshold is positive
+        tree["default_left"] = [int(c > 0) for c in tree["split_conditions"]]
+    sparse_booster = xgboost.Booster()
+    sparse_booster.load_model(bytearray(json.dumps(model).encode()))
+    return sparse_booster
+
+
+def load_pipe_engine(path: str) -> PipeEngine:
+    """Registry loader for pipe.pkl"""
+    import joblib
+    return PipeEngine(joblib.load(path))
+
+
+def pipe_inputs(states: pd.DataFrame, batting_team: str, bowling_team: str, city: str) -> pd.DataFrame:
+    """pipe.pkl input frame for win-model match states
+
+    Uses a target column if present, otherwise infers it from the required run rate.
+    """
+    if "target" in states.columns:
+        target = states["target"].to_numpy(dtype=np.float64)
+    else:
+        target = np.ceil(states["current_score"] + states["required_run_rate"] * states["balls_left"] / 6)
+    return pd.DataFrame({
+        "batting_team": states.get("batting_team", batting_team),
+        "bowling_team": states.get("bowling_team", bowling_team),
+        "city": states.get("city", city),
+        "runs_left": target - states["current_score"],
+        "balls_left": states["balls_left"],
+        "wickets_left": states["wickets_left"],
+        # The pipeline was trained on the first-innings total, one less than the target
+        "total_runs_x": target - 1,
+        "cur_run_rate": states["run_rate"],
+        "req_run_rate": states["required_run_rate"],
+    }, index=states.index)
+
+
+def _best_time(fn, repeats: int) -> float:
+    best = float("inf")
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def compare_engines(win_model, engine: PipeEngine, states: pd.DataFrame, win_X: np.ndarray,
+                    pipe_df: pd.DataFrame, repeats: int = 3) -> pd.DataFrame:
+    """Latency and accuracy of each engine on the same batch of match states
+
+    Accuracy columns are filled in when states has a 0/1 'won' column.
+    """
+    engines = {
+        "XGBoost win model": lambda: win_model.predict_proba(win_X)[:, 1],
+        "pipe.pkl (dense)": lambda: engine.pipe.predict_proba(pipe_df)[:, 1],
+        "pipe.pkl (sparse)": lambda: engine.predict_proba(pipe_df)[:, 1],
+    }
+    won = states["won"].to_numpy(dtype=np.float64) if "won" in states.columns else None
+
+    rows, reference = [], None
+    for name, predict in engines.items():
+        p = np.asarray(predict(), dtype=np.float64)
+        reference = p if reference is None else reference
+        seconds = _best_time(predict, repeats)
+        row = {"engine": name, "seconds": seconds, "rows_per_second": len(p) / seconds,
+               "mean_win_probability": p.mean(), "mean_abs_diff_vs_win_model": np.abs(p - reference).mean()}
+        if won is not None:
+            clipped = np.clip(p, 1e-15, 1 - 1e-15)
+            row["accuracy"] = ((p >= 0.5) == won).mean()
+            row["log_loss"] = -np.mean(won * np.log(clipped) + (1 - won) * np.log(1 - clipped))
+            row["brier"] = np.mean((p - won) ** 2)
+        rows.append(row)
+    return pd.DataFrame(rows)
@@ -0,0 +1,97 @@
+import threading
+
+import numpy as np
+import pandas as pd
+
+# Feature order the pickled XGBoost models were trained with
+WIN_FEATURES = ["current_score", "balls_left", "wickets_left", "run_rate", "required_run_rate"]
+BAT_FEATURES = ["batsman_encoded", "ball", "wickets_left", "run_rate", "required_run_rate"]
+TOTAL_BALLS = 120
+
+# Range each win-model input is swept over; counts are swept in whole steps
+SWEEP_RANGES = {
+    "current_score": (0, 250),
+    "balls_left": (0, 120),
+    "wickets_left": (0, 10),
+    "run_rate": (0, 18),
+    "required_run_rate": (0, 36),
+}
+INTEGER_FEATURES = {"current_score", "balls_left", "wickets_left"}
+
+
+def read_match_states(uploaded_file) -> pd.DataFrame:
+    """Read an uploaded CSV or Parquet file of match states"""
+    name = getattr(uploaded_file, "name", str(uploaded_file)).lower()
+    if name.endswith((".parquet", ".pq")):
+        return pd.read_parquet(uploaded_file)
+    return pd.read_csv(uploaded_file)
+
+
+def win_feature_matrix(df: pd.DataFrame) -> np.ndarray:
+    """Validate a match-state frame and return it as an (n, 5) float matrix"""
+    missing = [col for col in WIN_FEATURES if col not in df.columns]
+    if missing:
+        raise ValueError(f"Missing required columns: {', '.join(missing)}")
+
+    features = df[WIN_FEATURES].apply(pd.to_numeric, errors="coerce")
+    bad_rows = features.isna().any(axis=1)
+    if bad_rows.any():
+        raise ValueError(f"{int(bad_rows.sum())} row(s) have missing or non-numeric values")
+    return features.to_numpy(dtype=np.float32)
+
+
+def chase_features(current_score, balls_left, wickets_left, target) -> np.ndarray:
+    """Win-model input matrix for chase states, deriving both run rates from the target"""
+    score, balls_left, wickets_left, target = np.broadcast_arrays(
+        *(np.asarray(v, dtype=np.float64) for v in (current_score, balls_left, wickets_left, target))
+    )
+    bowled = TOTAL_BALLS - balls_left
+    run_rate = np.divide(score * 6, bowled, out=np.zeros_like(score), where=bowled > 0)
+    required_run_rate = (target - score) * 6 / np.maximum(balls_left, 1)
+    return np.column_stack([score, balls_left, wickets_left, run_rate, required_run_rate]).astype(np.float32)
+
+
+def score_win_states(win_model, df: pd.DataFrame) -> pd.DataFrame:
+    """Score every match state in one predict_proba call"""
+    X = win_feature_matrix(df)
+    scored = df.copy()
+    scored["win_probability"] = win_model.predict_proba(X)[:, 1] if len(X) else np.empty(0)
+    return scored
+
+
+def sensitivity_sweep(win_model, base_state, feature: str, n_points: int = 181) -> pd.DataFrame:
+    """Win probability as one input varies across its range, from one predict_proba call"""
+    lo, hi = SWEEP_RANGES[feature]
+    if feature in INTEGER_FEATURES:
+        values = np.arange(lo, hi + 1, dtype=np.float64)
+    else:
+        values = np.linspace(lo, hi, n_points)
+    X = np.tile(np.asarray(base_state, dtype=np.float32), (len(values), 1))
+    X[:, WIN_FEATURES.index(feature)] = values
+    return pd.DataFrame({feature: values, "win_probability": win_model.predict_proba(X)[:, 1]})
+
+
+class BatsmanRanker:
+    """Projects runs for every known batsman from one reusable (n, 5) input matrix"""
+
+    def __init__(self, names):
+        self.names = np.asarray(names)
+        self._X = np.zeros((len(self.names), len(BAT_FEATURES)), dtype=np.float32)
+        self._X[:, 0] = np.arange(len(self.names))  # LabelEncoder codes
+        self._lock = threading.Lock()
+
+    def rank(self, bat_model, balls_faced, wickets_left, run_rate, required_run_rate,
+             top_k: int = 10) -> pd.DataFrame:
+        """Top-k batsmen by predicted runs for one match state, in one predict call"""
+        with self._lock:
+            self._X[:, 1:] = (balls_faced, wickets_left, run_rate, required_run_rate)
+            runs = np.asarray(bat_model.predict(self._X), dtype=np.float64)
+
+        top_k = min(top_k, len(runs))
+        top = np.argpartition(-runs, top_k - 1)[:top_k]
+        top = top[np.argsort(-runs[top], kind="stable")]
+        return pd.DataFrame({
+            "rank": np.arange(1, top_k + 1),
+            "batsman": self.names[top],
+            "predicted_runs": np.round(runs[top], 1),
+        })
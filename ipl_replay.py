@@ -0,0 +1,110 @@
+"""Ball-by-ball match feeds for live and fast-forward win-probability replay.
+
+A feed is CSV or JSON Lines with one delivery per record. Each record needs
+current_score, balls_left and wickets_left, plus either target or both
+run_rate and required_run_rate.
+
+To stand in for a live scoreboard socket, replay a feed file over TCP:
+
+    python ipl_replay.py match.csv --port 9009 --balls-per-second 2
+
+and point the app's socket source at 127.0.0.1:9009.
+"""
+import argparse
+import csv
+import io
+import json
+import socket
+import time
+
+import numpy as np
+import pandas as pd
+
+from ipl_predict import WIN_FEATURES, chase_features, win_feature_matrix
+
+
+def _is_jsonl(name: str) -> bool:
+    return name.lower().endswith((".jsonl", ".ndjson", ".json"))
+
+
+def _iter_records(text, name: str):
+    if _is_jsonl(name):
+        for line in text:
+            if line.strip():
+                yield json.loads(line)
+    else:
+        yield from csv.DictReader(text)
+
+
+def iter_feed_file(feed, name: str = None):
+    """Yield one record per delivery from a feed path or binary file object"""
+    name = name or getattr(feed, "name", str(feed))
+    if isinstance(feed, str):
+        with open(feed, encoding="utf-8") as text:
+            yield from _iter_records(text, name)
+    else:
+        text = io.TextIOWrapper(feed, encoding="utf-8")
+        try:
+            yield from _iter_records(text, name)
+        finally:
+            # Leave the caller's file object open
+            text.detach()
+
+
+def iter_socket_feed(host: str, port: int, timeout: float = 30.0):
+    """Yield JSON records sent one per line over a TCP connection until it closes"""
+    with socket.create_connection((host, port), timeout=timeout) as conn:
+        for line in conn.makefile("r", encoding="utf-8"):
+            if line.strip():
+                yield json.loads(line)
+
+
+def record_features(record: dict) -> np.ndarray:
+    """(1, 5) win-model input for one delivery record"""
+    if "run_rate" in record and "required_run_rate" in record:
+        return np.array([[float(record[f]) for f in WIN_FEATURES]], dtype=np.float32)
+    return chase_features(
+        float(record["current_score"]), float(record["balls_left"]),
+        float(record["wickets_left"]), float(record["target"]),
+    )
+
+
+def feed_features(df: pd.DataFrame) -> np.ndarray:
+    """(n, 5) win-model inputs for a whole feed, as in record_features"""
+    if "run_rate" in df.columns and "required_run_rate" in df.columns:
+        return win_feature_matrix(df)
+    return chase_features(df["current_score"], df["balls_left"], df["wickets_left"], df["target"])
+
+
+def fast_forward(win_model, feed, name: str = None) -> pd.DataFrame:
+    """Score a completed match's whole feed in one vectorized call"""
+    name = name or getattr(feed, "name", str(feed))
+    df = pd.read_json(feed, lines=True) if _is_jsonl(name) else pd.read_csv(feed)
+    df = df.reset_index(drop=True)
+    df["win_probability"] = win_model.predict_proba(feed_features(df))[:, 1] if len(df) else []
+    return df
+
+
+def serve_feed(path: str, host: str = "127.0.0.1", port: int = 9009, balls_per_second: float = 1.0):
+    """Send a feed file's records as JSON lines to each client that connects, at match pace"""
+    with socket.create_server((host, port)) as server:
+        print(f"Replaying {path} on {host}:{port}")
+        while True:
+            conn, _ = server.accept()
+            with conn:
+                try:
+                    for record in iter_feed_file(path):
+                        conn.sendall((json.dumps(record) + "\n").encode())
+                        time.sleep(1 / balls_per_second)
+                except (BrokenPipeError, ConnectionResetError):
+                    pass
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve a ball-by-ball feed file over a local socket")
+    parser.add_argument("feed")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9009)
+    parser.add_argument("--balls-per-second", type=float, default=1.0)
+    args = parser.parse_args()
+    serve_feed(args.feed, args.host, args.port, args.balls_per_second)
@@ -0,0 +1,192 @@
+"""Headless HTTP/JSON server for the IPL models with request micro-batching.
+
+    python ipl_server.py --port 8000 --max-batch-size 256 --max-wait-ms 5
+
+POST /predict/win      {"current_score": 85, "balls_left": 48, "wickets_left": 6,
+                        "run_rate": 7.5, "required_run_rate": 8.3}
+POST /predict/batsman  {"batsman": "V Kohli", "ball": 20, "wickets_left": 7,
+                        "run_rate": 8.0, "required_run_rate": 7.9}
+GET  /stats            batching counters
+
+Single-row requests that arrive within max-wait-ms of each other are scored
+together in one predict_proba/predict call.
+"""
+import argparse
+import json
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+
+from ipl_models import registry
+from ipl_predict import BAT_FEATURES, WIN_FEATURES
+
+
+class MicroBatcher:
+    """Coalesces single-row predictions from many threads into batched calls"""
+
+    def __init__(self, predict_fn, max_batch_size: int = 256, max_wait_ms: float = 5.0):
+        self.predict_fn = predict_fn
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self.batches = 0
+        self.rows = 0
+        self._queue = queue.Queue()
+        self._worker = threading.Thread(target=self._run, daemon=True)
+        self._worker.start()
+
+    def submit(self, row) -> Future:
+        future = Future()
+        self._queue.put((row, future))
+        return future
+
+    def stats(self) -> dict:
+        return {
+            "batches": self.batches,
+            "rows": self.rows,
+            "mean_batch_size": self.rows / self.batches if self.batches else 0.0,
+            "queued": self._queue.qsize(),
+        }
+
+    def _collect(self) -> list:
+        """Block for one request, then take more until the batch is full or the wait expires"""
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            rows = np.array([row for row, _ in batch], dtype=np.float32)
+            try:
+                results = self.predict_fn(rows)
+            except Exception as e:
+                for _, future in batch:
+                    future.set_exception(e)
+                continue
+            self.batches += 1
+            self.rows += len(batch)
+            for (_, future), result in zip(batch, results):
+                future.set_result(float(result))
+
+
+class PredictionHandler(BaseHTTPRequestHandler):
+    # Set by make_server
+    win_batcher = None
+    bat_batcher = None
+    batsman_index = None
+
+    def do_GET(self):
+        if self.path == "/health":
+            self._send(200, {"status": "ok"})
+        elif self.path == "/stats":
+            self._send(200, {"win": self.win_batcher.stats(), "batsman": self.bat_batcher.stats()})
+        else:
+            self._send(404, {"error": f"Unknown path {self.path}"})
+
+    def do_POST(self):
+        try:
+            length = int(self.headers.get("Content-Length", 0))
+            body = json.loads(self.rfile.read(length) or b"{}")
+        except ValueError:
+            self._send(400, {"error": "Request body must be JSON"})
+            return
+        if not isinstance(body, dict):
+            self._send(400, {"error": "Request body must be a JSON object"})
+            return
+
+        if self.path == "/predict/win":
+            self._predict(self.win_batcher, body, WIN_FEATURES, "win_probability")
+        elif self.path == "/predict/batsman":
+            name = self.batsman_index.resolve(str(body.get("batsman", "")))
+            if name is None:
+                self._send(404, {
+                    "error": f"Unknown batsman '{body.get('batsman')}'",
+                    "suggestions": self.batsman_index.suggest(str(body.get("batsman", ""))),
+                })
+                return
+            body["batsman_encoded"] = self.batsman_index.encode(name)
+            self._predict(self.bat_batcher, body, BAT_FEATURES, "predicted_runs", batsman=name)
+        else:
+            self._send(404, {"error": f"Unknown path {self.path}"})
+
+    def _predict(self, batcher: MicroBatcher, body: dict, features: list, key: str, **extra):
+        try:
+            row = [float(body[f]) for f in features]
+        except KeyError as e:
+            self._send(400, {"error": f"Missing field {e.args[0]}"})
+            return
+        except (TypeError, ValueError):
+            self._send(400, {"error": "All feature values must be numeric"})
+            return
+
+        try:
+            result = batcher.submit(row).result()
+        except Exception as e:
+            self._send(500, {"error": str(e)})
+            return
+        self._send(200, {key: result, **extra})
+
+    def _send(self, status: int, payload: dict):
+        data = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        # Per-request access logs would dominate at scoreboard request rates
+        pass
+
+
+class PredictionServer(ThreadingHTTPServer):
+    # The default listen backlog of 5 resets connections under scoreboard fan-in
+    request_queue_size = 1024
+
+
+def make_server(host: str = "127.0.0.1", port: int = 8000, max_batch_size: int = 256,
+                max_wait_ms: float = 5.0) -> PredictionServer:
+    win_model = registry.get("win")
+    bat_model = registry.get("batsman")
+
+    handler = type("IPLPredictionHandler", (PredictionHandler,), {
+        "win_batcher": MicroBatcher(lambda X: win_model.predict_proba(X)[:, 1], max_batch_size, max_wait_ms),
+        "bat_batcher": MicroBatcher(bat_model.predict, max_batch_size, max_wait_ms),
+        "batsman_index": registry.get("batsman_index"),
+    })
+    return PredictionServer((host, port), handler)
+
+
+if __name__ == "__main__":
+    from ipl_trees import FlatTreeModel
+
+    parser = argparse.ArgumentParser(description="Serve the IPL models over HTTP with micro-batching")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--max-batch-size", type=int, default=256)
+    parser.add_argument("--max-wait-ms", type=float, default=5.0)
+    parser.add_argument("--flat", action="store_true", help="serve the NumPy tree exports instead of the pickles")
+    args = parser.parse_args()
+
+    if args.flat:
+        registry.register("win", "win_predictor_model.npz", loader=FlatTreeModel.load)
+        registry.register("batsman", "batsman_predictor_model.npz", loader=FlatTreeModel.load)
+
+    server = make_server(args.host, args.port, args.max_batch_size, args.max_wait_ms)
+    print(f"Serving IPL predictions on http://{args.host}:{args.port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
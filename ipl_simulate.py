@@ -0,0 +1,124 @@
+"""Vectorized Monte Carlo simulation of the rest of a T20 chase.
+
+Every trajectory is a row in NumPy arrays; each simulated ball advances all
+of them at once and scores every still-live state with the win model in one
+batch. Chunks of trajectories can run in a process pool.
+"""
+import os
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+
+import joblib
+import numpy as np
+import pandas as pd
+
+from ipl_predict import chase_features
+
+# Outcome of one legal delivery: runs scored, or a wicket (-1)
+BALL_OUTCOMES = np.array([0, 1, 2, 3, 4, 6, -1])
+DEFAULT_OUTCOME_PROBS = (0.36, 0.36, 0.07, 0.005, 0.115, 0.05, 0.04)
+PROB_BINS = 101
+
+_worker_model = None
+
+
+class SimulationResult:
+    """Final scores, outcomes and per-ball win-probability histograms of a simulation"""
+
+    def __init__(self, final_scores: np.ndarray, wins: np.ndarray, prob_hist: np.ndarray):
+        self.final_scores = final_scores
+        self.wins = wins
+        # prob_hist[b, k]: trajectories whose model win probability after ball b fell in bin k
+        self.prob_hist = prob_hist
+
+    @property
+    def n_rollouts(self) -> int:
+        return len(self.final_scores)
+
+    @property
+    def win_probability(self) -> float:
+        return float(self.wins.mean())
+
+    def fan_chart(self, percentiles=(5, 25, 50, 75, 95)) -> pd.DataFrame:
+        """Win-probability percentiles after each remaining ball"""
+        cdf = np.cumsum(self.prob_hist, axis=1) / self.prob_hist.sum(axis=1, keepdims=True)
+        bins = np.linspace(0, 1, PROB_BINS)
+        fan = {"ball": np.arange(len(cdf))}
+        for q in percentiles:
+            fan[f"p{q}"] = bins[np.argmax(cdf >= q / 100, axis=1)]
+        return pd.DataFrame(fan)
+
+    @classmethod
+    def combine(cls, parts: list) -> "SimulationResult":
+        return cls(
+            np.concatenate([p.final_scores for p in parts]),
+            np.concatenate([p.wins for p in parts]),
+            sum(p.prob_hist for p in parts),
+        )
+
+
+def simulate_chunk(win_model, current_score: int, balls_left: int, wickets_left: int,
+                   target: int, n_rollouts: int, outcome_probs=DEFAULT_OUTCOME_PROBS,
+                   seed=None) -> SimulationResult:
+    """Roll out n_rollouts chases ball by ball from one match state"""
+    rng = np.random.default_rng(seed)
+    score = np.full(n_rollouts, current_score, dtype=np.int32)
+    wickets = np.full(n_rollouts, wickets_left, dtype=np.int32)
+    prob_hist = np.zeros((balls_left + 1, PROB_BINS), dtype=np.int64)
+
+    for ball in range(balls_left + 1):
+        remaining = balls_left - ball
+        if ball > 0:
+            live = (wickets > 0) & (score < target)
+            outcome = BALL_OUTCOMES[rng.choice(len(BALL_OUTCOMES), size=n_rollouts, p=outcome_probs)]
+            score += np.where(live & (outcome > 0), outcome, 0)
+            wickets -= live & (outcome < 0)
+
+        # Finished chases are decided; only live states go through the model
+        prob = (score >= target).astype(np.float64)
+        live = (wickets > 0) & (score < target) & (remaining > 0)
+        if live.any():
+            X = chase_features(score[live], remaining, wickets[live], target)
+            prob[live] = win_model.predict_proba(X)[:, 1]
+        prob_hist[ball] = np.bincount(np.rint(prob * (PROB_BINS - 1)).astype(np.intp), minlength=PROB_BINS)
+
+    return SimulationResult(score, score >= target, prob_hist)
+
+
+def _init_worker(model_path: str, loader):
+    global _worker_model
+    _worker_model = loader(model_path)
+
+
+def _simulate_chunk_worker(args):
+    return simulate_chunk(_worker_model, *args)
+
+
+def simulate_innings(model_path: str, current_score: int, balls_left: int, wickets_left: int,
+                     target: int, n_rollouts: int = 100_000, outcome_probs=DEFAULT_OUTCOME_PROBS,
+                     n_workers=None, chunk_size: int = 10_000, seed=None, loader=joblib.load,
+                     win_model=None) -> SimulationResult:
+    """Simulate n_rollouts chases, split into chunks across a process pool
+
+    With n_workers=1 the chunks run in this process, using win_model if given.
+    """
+    n_workers = n_workers or os.cpu_count() or 1
+    seeds = np.random.SeedSequence(seed).spawn((n_rollouts + chunk_size - 1) // chunk_size)
+    chunks = [
+        (current_score, balls_left, wickets_left, target,
+         min(chunk_size, n_rollouts - i * chunk_size), outcome_probs, s)
+        for i, s in enumerate(seeds)
+    ]
+
+    if n_workers == 1:
+        model = win_model if win_model is not None else loader(model_path)
+        return SimulationResult.combine([simulate_chunk(model, *c) for c in chunks])
+
+    # spawn, not fork: forking a process that already ran XGBoost/OpenMP can deadlock
+    with ProcessPoolExecutor(
+        max_workers=n_workers,
+        mp_context=get_context("spawn"),
+        initializer=_init_worker,
+        initargs=(model_path, loader),
+    ) as pool:
+        return SimulationResult.combine(list(pool.map(_simulate_chunk_worker, chunks)))
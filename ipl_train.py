@@ -0,0 +1,229 @@
+"""Out-of-core retraining of the win model from ball-by-ball data.
+
+    python ipl_train.py deliveries.csv matches.csv --promote
+
+Deliveries are streamed in chunks twice: once for first-innings totals, then
+through an XGBoost DataIter that builds the five win-model features for the
+chase and feeds a QuantileDMatrix, so the raw data is never held in memory.
+Each run writes a versioned, checksummed artifact under models/win/<version>/.
+--promote copies it over win_predictor_model.pkl (and refreshes the flat
+export); a running app picks it up through registry.reload_changed().
+"""
+import argparse
+import json
+import os
+import shutil
+import tempfile
+import time
+import uuid
+
+import joblib
+import numpy as np
+import pandas as pd
+import xgboost
+
+from ipl_benchmark import sha256_file
+from ipl_models import BASE_DIR, MODEL_FILES
+from ipl_predict import WIN_FEATURES, chase_features
+from ipl_trees import FlatTreeModel
+
+# Column names in the deliveries and matches files (Kaggle IPL layout by default)
+DEFAULT_COLUMNS = {
+    "match_id": "match_id",
+    "inning": "inning",
+    "batting_team": "batting_team",
+    "total_runs": "total_runs",
+    "player_dismissed": "player_dismissed",
+    "wide_runs": "wide_runs",
+    "noball_runs": "noball_runs",
+    "matches_id": "id",
+    "winner": "winner",
+}
+DEFAULT_PARAMS = {
+    "objective": "binary:logistic",
+    "eval_metric": "logloss",
+    "tree_method": "hist",
+    "max_depth": 6,
+    "eta": 0.3,
+    "nthread": -1,
+}
+
+
+def read_deliveries(path: str, columns: dict, chunk_size: int):
+    wanted = {columns[k] for k in ("match_id", "inning", "batting_team", "total_runs",
+                                   "player_dismissed", "wide_runs", "noball_runs")}
+    return pd.read_csv(path, chunksize=chunk_size, usecols=lambda c: c in wanted)
+
+
+def first_innings_totals(path: str, columns: dict, chunk_size: int) -> pd.Series:
+    """Runs scored in the first innings of every match, in one streaming pass"""
+    totals = None
+    for chunk in read_deliveries(path, columns, chunk_size):
+        first = chunk[chunk[columns["inning"]] == 1]
+        sums = first.groupby(columns["match_id"])[columns["total_runs"]].sum()
+        totals = sums if totals is None else totals.add(sums, fill_value=0)
+    if totals is None:
+        raise ValueError(f"{path} has no deliveries")
+    return totals
+
+
+class ChaseFeatureIter(xgboost.DataIter):
+    """Streams second-innings deliveries as (features, won) batches
+
+    Running score, wickets and legal balls are carried across chunk
+    boundaries per match, so matches may span chunks.
+    """
+
+    def __init__(self, path: str, targets: pd.Series, winners: pd.Series, columns: dict,
+                 chunk_size: int, holdout: bool, holdout_every: int):
+        self.path = path
+        self.targets = targets
+        self.winners = winners
+        self.columns = columns
+        self.chunk_size = chunk_size
+        self.holdout = holdout
+        self.holdout_every = holdout_every
+        self.reset()
+        super().__init__()
+
+    def reset(self):
+        self._chunks = None
+        self._carry = pd.DataFrame({k: pd.Series(dtype=np.int64) for k in ("runs", "wickets", "balls")})
+
+    def next(self, input_data) -> bool:
+        if self._chunks is None:
+            # Counted per pass; XGBoost resets the iterator after the last one
+            self.rows = 0
+            self._chunks = read_deliveries(self.path, self.columns, self.chunk_size)
+        for chunk in self._chunks:
+            X, y = self._features(chunk)
+            if len(X):
+                self.rows += len(X)
+                input_data(data=X, label=y, feature_names=WIN_FEATURES)
+                return True
+        return False
+
+    def _features(self, chunk: pd.DataFrame):
+        c = self.columns
+        chase = chunk[chunk[c["inning"]] == 2]
+        match = chase[c["match_id"]]
+        # Every holdout_every-th match (by id) is held out for validation
+        in_holdout = (match % self.holdout_every) == 0
+        keep = (in_holdout == self.holdout) & match.isin(self.targets.index) & match.isin(self.winners.index)
+        chase = chase[keep]
+        match = chase[c["match_id"]]
+        if chase.empty:
+            return np.empty((0, len(WIN_FEATURES))), np.empty(0)
+
+        legal = np.ones(len(chase), dtype=np.int64)
+        for extra in ("wide_runs", "noball_runs"):
+            if c[extra] in chase.columns:
+                legal &= (chase[c[extra]].fillna(0) == 0).to_numpy()
+        running = pd.DataFrame({
+            "runs": chase[c["total_runs"]].to_numpy(),
+            "wickets": chase[c["player_dismissed"]].notna().to_numpy().astype(np.int64),
+            "balls": legal,
+        }, index=chase.index)
+        running = running.groupby(match.to_numpy()).cumsum()
+
+        carried = self._carry.reindex(match.to_numpy(), fill_value=0).set_axis(chase.index)
+        running += carried
+        # Latest running totals per match, carried into the next chunk
+        last = running.groupby(match.to_numpy()).tail(1)
+        last.index = match[last.index].to_numpy()
+        self._carry = pd.concat([self._carry.drop(last.index, errors="ignore"), last])
+
+        target = match.map(self.targets).to_numpy() + 1
+        X = chase_features(running["runs"], 120 - running["balls"].clip(upper=120),
+                           10 - running["wickets"].clip(upper=10), target)
+        won = (match.map(self.winners) == chase[c["batting_team"]]).to_numpy(dtype=np.float32)
+        return X, won
+
+
+def train_win_model(deliveries: str, matches: str, out_dir: str = "models/win", rounds: int = 100,
+                    chunk_size: int = 200_000, holdout_every: int = 5, params=None,
+                    columns=None) -> str:
+    """Train a win model out of core and write a versioned artifact; returns its directory"""
+    columns = {**DEFAULT_COLUMNS, **(columns or {})}
+    params = {**DEFAULT_PARAMS, **(params or {})}
+
+    targets = first_innings_totals(deliveries, columns, chunk_size)
+    match_info = pd.read_csv(matches, usecols=[columns["matches_id"], columns["winner"]])
+    winners = match_info.dropna().set_index(columns["matches_id"])[columns["winner"]]
+
+    train_iter = ChaseFeatureIter(deliveries, targets, winners, columns, chunk_size, False, holdout_every)
+    valid_iter = ChaseFeatureIter(deliveries, targets, winners, columns, chunk_size, True, holdout_every)
+    train = xgboost.QuantileDMatrix(train_iter)
+    valid = xgboost.QuantileDMatrix(valid_iter, ref=train)
+
+    evals_result = {}
+    start = time.perf_counter()
+    booster = xgboost.train(params, train, rounds, evals=[(valid, "valid")],
+                            evals_result=evals_result, verbose_eval=False)
+    train_seconds = time.perf_counter() - start
+
+    # Unique even for two runs finishing in the same second
+    version = time.strftime("%Y%m%dT%H%M%SZ_", time.gmtime()) + uuid.uuid4().hex[:6]
+    artifact_dir = os.path.join(out_dir, version)
+    os.makedirs(artifact_dir)
+    booster_path = os.path.join(artifact_dir, "model.json")
+    booster.save_model(booster_path)
+
+    # Same sklearn wrapper type as the shipped pickle, so the app can load it unchanged
+    model = xgboost.XGBClassifier()
+    model.load_model(booster_path)
+    pickle_path = os.path.join(artifact_dir, MODEL_FILES["win"])
+    joblib.dump(model, pickle_path)
+
+    manifest = {
+        "version": version,
+        "features": WIN_FEATURES,
+        "params": params,
+        "rounds": rounds,
+        "train_rows": train_iter.rows,
+        "valid_rows": valid_iter.rows,
+        f"valid_{params['eval_metric']}": evals_result["valid"][params["eval_metric"]][-1],
+        "train_seconds": train_seconds,
+        "sources": {p: sha256_file(p) for p in (deliveries, matches)},
+        "artifacts": {os.path.basename(p): sha256_file(p) for p in (pickle_path, booster_path)},
+    }
+    with open(os.path.join(artifact_dir, "manifest.json"), "w") as f:
+        json.dump(manifest, f, indent=2)
+    return artifact_dir
+
+
+def promote(artifact_dir: str, base_dir: str = BASE_DIR):
+    """Verify an artifact's checksum and atomically swap it in as the live win model"""
+    with open(os.path.join(artifact_dir, "manifest.json")) as f:
+        manifest = json.load(f)
+    source = os.path.join(artifact_dir, MODEL_FILES["win"])
+    if sha256_file(source) != manifest["artifacts"][MODEL_FILES["win"]]:
+        raise ValueError(f"{source} does not match the checksum in its manifest")
+
+    model = joblib.load(source)
+    flat_path = os.path.join(base_dir, "win_predictor_model.npz")
+    # Write beside the targets, then rename over them so readers never see partial files
+    with tempfile.NamedTemporaryFile(dir=base_dir, suffix=".npz", delete=False) as tmp:
+        FlatTreeModel.from_xgboost(model).save(tmp)
+    os.replace(tmp.name, flat_path)
+    with tempfile.NamedTemporaryFile(dir=base_dir, suffix=".pkl", delete=False) as tmp:
+        with open(source, "rb") as f:
+            shutil.copyfileobj(f, tmp)
+    os.replace(tmp.name, os.path.join(base_dir, MODEL_FILES["win"]))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Retrain the win model from ball-by-ball data")
+    parser.add_argument("deliveries", help="ball-by-ball CSV")
+    parser.add_argument("matches", help="match results CSV with the winner of each match")
+    parser.add_argument("--out-dir", default="models/win")
+    parser.add_argument("--rounds", type=int, default=100)
+    parser.add_argument("--chunk-size", type=int, default=200_000)
+    parser.add_argument("--promote", action="store_true", help="make the new model the live win model")
+    args = parser.parse_args()
+
+    artifact_dir = train_win_model(args.deliveries, args.matches, args.out_dir, args.rounds, args.chunk_size)
+    print(f"Wrote {artifact_dir}")
+    if args.promote:
+        promote(artifact_dir)
+        print(f"Promoted {artifact_dir} to {MODEL_FILES['win']}")
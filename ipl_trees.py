@@ -0,0 +1,176 @@
+"""Flattened, NumPy-only evaluator for the pickled XGBoost models.
+
+Export once (needs xgboost):
+
+    python ipl_trees.py
+
+which writes win_predictor_model.npz and batsman_predictor_model.npz next to
+the pickles. FlatTreeModel.load() then serves predictions without importing
+xgboost at all.
+"""
+import argparse
+import json
+
+import numpy as np
+
+# Pickle -> flat export written by the CLI
+EXPORTS = {
+    "win_predictor_model.pkl": "win_predictor_model.npz",
+    "batsman_predictor_model.pkl": "batsman_predictor_model.npz",
+}
+SUPPORTED_OBJECTIVES = ("binary:logistic", "reg:squarederror")
+
+
+class FlatTreeModel:
+    """Boosted trees stored as flat node arrays and evaluated with vectorized NumPy"""
+
+    def __init__(self, feature, threshold, left, right, default_left, value, roots,
+                 base_score: float, objective: str, max_depth: int):
+        if objective not in SUPPORTED_OBJECTIVES:
+            raise ValueError(f"Unsupported objective '{objective}'")
+        self.feature = feature
+        self.threshold = threshold
+        self.left = left
+        self.right = right
+        self.default_left = default_left
+        self.value = value
+        self.roots = roots
+        self.base_score = float(base_score)
+        self.objective = objective
+        self.max_depth = int(max_depth)
+        # Right children then left children, indexed by node + go_left * n_nodes
+        self._children = np.concatenate([right, left])
+
+    @classmethod
+    def from_xgboost(cls, model) -> "FlatTreeModel":
+        """Flatten an XGBClassifier/XGBRegressor (or raw Booster) into node tables"""
+        booster = model.get_booster() if hasattr(model, "get_booster") else model
+        learner = json.loads(booster.save_raw(raw_format="json"))["learner"]
+        trees = learner["gradient_booster"]["model"]["trees"]
+
+        columns = {k: [] for k in ("feature", "threshold", "left", "right", "default_left", "value")}
+        roots, max_depth, offset = [], 0, 0
+        for tree in trees:
+            left = np.asarray(tree["left_children"], dtype=np.int32)
+            right = np.asarray(tree["right_children"], dtype=np.int32)
+            is_leaf = left == -1
+            own = np.arange(len(left), dtype=np.int32)
+            # Leaves point back at themselves so extra traversal steps are no-ops
+            columns["left"].append(np.where(is_leaf, own, left) + offset)
+            columns["right"].append(np.where(is_leaf, own, right) + offset)
+            columns["feature"].append(np.asarray(tree["split_indices"], dtype=np.int32))
+            columns["threshold"].append(np.asarray(tree["split_conditions"], dtype=np.float32))
+            columns["default_left"].append(np.asarray(tree["default_left"], dtype=bool))
+            # For leaves XGBoost stores the leaf weight in split_conditions
+            columns["value"].append(np.where(is_leaf, tree["split_conditions"], 0).astype(np.float32))
+            roots.append(offset)
+            max_depth = max(max_depth, _tree_depth(left, right))
+            offset += len(left)
+
+        base_score = float(learner["learner_model_param"]["base_score"].strip("[]"))
+        return cls(
+            **{k: np.concatenate(v) for k, v in columns.items()},
+            roots=np.asarray(roots, dtype=np.int32),
+            base_score=base_score,
+            objective=learner["objective"]["name"],
+            max_depth=max_depth,
+        )
+
+    @classmethod
+    def load(cls, path: str) -> "FlatTreeModel":
+        with np.load(path) as data:
+            arrays = {k: data[k] for k in data.files}
+        meta = json.loads(str(arrays.pop("meta")))
+        return cls(**arrays, **meta)
+
+    def save(self, path: str):
+        meta = {"base_score": self.base_score, "objective": self.objective, "max_depth": self.max_depth}
+        np.savez(
+            path,
+            feature=self.feature, threshold=self.threshold, left=self.left, right=self.right,
+            default_left=self.default_left, value=self.value, roots=self.roots,
+            meta=np.array(json.dumps(meta)),
+        )
+
+    def predict_margin(self, X, chunk_size: int = 4096) -> np.ndarray:
+        """Raw boosted score (log-odds for classifiers) for each row of X"""
+        X = np.atleast_2d(np.asarray(X, dtype=np.float32))
+        has_missing = bool(np.isnan(X).any())
+        base = self.base_score
+        if self.objective == "binary:logistic":
+            base = np.log(base / (1.0 - base))
+
+        margin = np.empty(len(X))
+        for start in range(0, len(X), chunk_size):
+            chunk = X[start:start + chunk_size]
+            cells = chunk.ravel()
+            row_offset = (np.arange(len(chunk)) * X.shape[1])[:, None]
+            # One column per tree; every step moves each row one level down each tree
+            node = np.broadcast_to(self.roots, (len(chunk), len(self.roots)))
+            for _ in range(self.max_depth):
+                x = np.take(cells, row_offset + np.take(self.feature, node))
+                go_left = x < np.take(self.threshold, node)
+                if has_missing:
+                    go_left = np.where(np.isnan(x), np.take(self.default_left, node), go_left)
+                node = np.take(self._children, node + go_left * len(self.left))
+            margin[start:start + len(chunk)] = np.take(self.value, node).sum(axis=1, dtype=np.float64)
+        return margin + base
+
+    def predict_proba(self, X) -> np.ndarray:
+        """Class probabilities, shaped (n, 2) like XGBClassifier.predict_proba"""
+        if self.objective != "binary:logistic":
+            raise AttributeError("predict_proba is only available for classifiers")
+        p = 1.0 / (1.0 + np.exp(-self.predict_margin(X)))
+        return np.column_stack([1.0 - p, p])
+
+    def predict(self, X) -> np.ndarray:
+        if self.objective == "binary:logistic":
+            return (self.predict_margin(X) > 0).astype(np.int64)
+        return self.predict_margin(X)
+
+
+def _tree_depth(left: np.ndarray, right: np.ndarray) -> int:
+    depth = np.zeros(len(left), dtype=np.int32)
+    # XGBoost numbers children after their parents, so one forward pass suffices
+    for parent in range(len(left)):
+        if left[parent] != -1:
+            depth[left[parent]] = depth[right[parent]] = depth[parent] + 1
+    return int(depth.max())
+
+
+def max_prediction_error(model, flat: FlatTreeModel, X) -> float:
+    """Largest absolute difference between the XGBoost model and its flat export"""
+    if flat.objective == "binary:logistic":
+        return float(np.abs(model.predict_proba(X)[:, 1] - flat.predict_proba(X)[:, 1]).max())
+    return float(np.abs(model.predict(X) - flat.predict(X)).max())
+
+
+def sample_split_space(flat: FlatTreeModel, n: int, seed: int = 0) -> np.ndarray:
+    """Random inputs spanning the range of every feature's split thresholds"""
+    rng = np.random.default_rng(seed)
+    splits = flat.left != np.arange(len(flat.left))
+    n_features = int(flat.feature[splits].max()) + 1
+    X = np.empty((n, n_features), dtype=np.float32)
+    for f in range(n_features):
+        thresholds = flat.threshold[splits & (flat.feature == f)]
+        lo, hi = (thresholds.min(), thresholds.max()) if len(thresholds) else (0.0, 1.0)
+        X[:, f] = rng.uniform(lo - 1, hi + 1, n)
+    return X
+
+
+if __name__ == "__main__":
+    import joblib
+
+    parser = argparse.ArgumentParser(description="Export the XGBoost pickles as flat NumPy tree tables")
+    parser.add_argument("--samples", type=int, default=20_000, help="rows used to verify each export")
+    parser.add_argument("--tolerance", type=float, default=1e-3)
+    args = parser.parse_args()
+
+    for pkl_path, npz_path in EXPORTS.items():
+        model = joblib.load(pkl_path)
+        flat = FlatTreeModel.from_xgboost(model)
+        error = max_prediction_error(model, flat, sample_split_space(flat, args.samples))
+        if error > args.tolerance:
+            raise SystemExit(f"{pkl_path}: flat export differs by {error:.2e}, not writing {npz_path}")
+        flat.save(npz_path)
+        print(f"Wrote {npz_path} ({len(flat.roots)} trees, {len(flat.left)} nodes, max error {error:.2e})")
@@ -0,0 +1,265 @@
+"""Offline batch jobs for large experiment designs.
+
+A design is written as a JSONL batch file, one chat-completion request per
+run with custom_id "run-<RunOrder>", and submitted to a batch backend. Its
+results file can come back in any order and is joined to the design by
+custom_id whenever it is ready. Each job's request file, design and
+settings are kept under batches/jobs/<job>/, so results can be collected in
+a later session.
+
+OpenAIBatchBackend uses the OpenAI Batch API. DirectoryBatchBackend is a
+local stand-in: submitting drops the file in a directory, and a worker
+started with
+
+    python llm_batch.py worker batches/local --base-url http://127.0.0.1:8010/v1
+
+runs pending batches against any chat-completions endpoint (e.g.
+llm_mock_server.py) and writes OpenAI-format results files.
+"""
+import argparse
+import json
+import os
+import shutil
+import time
+import uuid
+
+import pandas as pd
+
+from llm_client import TokenBucket, chat_url, get_session, post_with_backoff, run_concurrently
+
+BATCH_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "batches")
+ENDPOINT = "/v1/chat/completions"
+FINAL_STATUSES = {"completed", "failed", "expired", "cancelled"}
+
+
+def custom_id(run_order: int) -> str:
+    return f"run-{int(run_order):05d}"
+
+
+def batch_lines(design_df: pd.DataFrame, payloads: list) -> list:
+    """One OpenAI batch request line per design run"""
+    return [
+        json.dumps({"custom_id": custom_id(run), "method": "POST", "url": ENDPOINT, "body": payload})
+        for run, payload in zip(design_df["RunOrder"], payloads)
+    ]
+
+
+def write_batch_file(design_df: pd.DataFrame, payloads: list, path: str):
+    with open(path, "w", encoding="utf-8") as f:
+        for line in batch_lines(design_df, payloads):
+            f.write(line + "\n")
+
+
+def read_results(lines) -> dict:
+    """custom_id -> (text, error, output_tokens) from a batch results file's lines"""
+    results = {}
+    for line in lines:
+        if isinstance(line, bytes):
+            line = line.decode("utf-8")
+        if not line.strip():
+            continue
+        record = json.loads(line)
+        response = record.get("response") or {}
+        body = response.get("body") or {}
+        if record.get("error") or response.get("status_code", 200) >= 400 or "choices" not in body:
+            error = record.get("error") or body.get("error") or f"status {response.get('status_code')}"
+            results[record["custom_id"]] = ("", f"Batch request failed: {error}", float("nan"))
+        else:
+            text = body["choices"][0].get("message", {}).get("content", "")
+            tokens = body.get("usage", {}).get("completion_tokens", float("nan"))
+            results[record["custom_id"]] = (text, None, tokens)
+    return results
+
+
+def join_results(design_df: pd.DataFrame, results: dict) -> pd.DataFrame:
+    """The design with Text, Error and OutputTokens columns; runs without a result get an error"""
+    df = design_df.copy()
+    rows = [results.get(custom_id(run), ("", "No result in the batch output", float("nan")))
+            for run in df["RunOrder"]]
+    df["Text"] = [text for text, _, _ in rows]
+    df["Error"] = [error for _, error, _ in rows]
+    df["OutputTokens"] = [tokens for _, _, tokens in rows]
+    return df
+
+
+class OpenAIBatchBackend:
+    """Batches through the OpenAI Files and Batches endpoints"""
+
+    name = "openai"
+
+    def __init__(self, base_url: str, headers: dict):
+        self.base_url = base_url.rstrip("/")
+        self.headers = headers
+        self.session = get_session()
+
+    def submit(self, path: str) -> str:
+        with open(path, "rb") as f:
+            upload = self.session.post(f"{self.base_url}/files", headers=self.headers,
+                                       data={"purpose": "batch"}, files={"file": f}, timeout=(5, 300))
+        upload.raise_for_status()
+        batch = self.session.post(f"{self.base_url}/batches", headers=self.headers, timeout=(5, 60), json={
+            "input_file_id": upload.json()["id"], "endpoint": ENDPOINT, "completion_window": "24h",
+        })
+        batch.raise_for_status()
+        return batch.json()["id"]
+
+    def status(self, batch_id: str) -> dict:
+        resp = self.session.get(f"{self.base_url}/batches/{batch_id}", headers=self.headers, timeout=(5, 60))
+        resp.raise_for_status()
+        return resp.json()
+
+    def results(self, batch_id: str):
+        """Lines of the results file, or None while the batch is still running"""
+        status = self.status(batch_id)
+        if status["status"] not in FINAL_STATUSES:
+            return None
+        lines = []
+        for key in ("output_file_id", "error_file_id"):
+            if status.get(key):
+                resp = self.session.get(f"{self.base_url}/files/{status[key]}/content",
+                                        headers=self.headers, timeout=(5, 300))
+                resp.raise_for_status()
+                lines.extend(resp.text.splitlines())
+        return lines
+
+
+class DirectoryBatchBackend:
+    """Local batch service: one directory per batch with input, status and output files"""
+
+    name = "directory"
+
+    def __init__(self, root: str):
+        self.root = root
+        os.makedirs(root, exist_ok=True)
+
+    def _path(self, batch_id: str, name: str) -> str:
+        return os.path.join(self.root, batch_id, name)
+
+    def submit(self, path: str) -> str:
+        batch_id = f"batch_{uuid.uuid4().hex[:16]}"
+        os.makedirs(os.path.join(self.root, batch_id))
+        shutil.copyfile(path, self._path(batch_id, "input.jsonl"))
+        self._write_status(batch_id, {"id": batch_id, "status": "validating", "created_at": int(time.time())})
+        return batch_id
+
+    def _write_status(self, batch_id: str, status: dict):
+        # Rename into place so a polling reader never sees a partial file
+        tmp = self._path(batch_id, "status.json.tmp")
+        with open(tmp, "w") as f:
+            json.dump(status, f)
+        os.replace(tmp, self._path(batch_id, "status.json"))
+
+    def status(self, batch_id: str) -> dict:
+        with open(self._path(batch_id, "status.json")) as f:
+            return json.load(f)
+
+    def results(self, batch_id: str):
+        if self.status(batch_id)["status"] not in FINAL_STATUSES:
+            return None
+        with open(self._path(batch_id, "output.jsonl"), encoding="utf-8") as f:
+            return f.read().splitlines()
+
+    def pending(self) -> list:
+        return sorted(
+            b for b in os.listdir(self.root)
+            if os.path.exists(self._path(b, "status.json")) and self.status(b)["status"] == "validating"
+        )
+
+    def process(self, batch_id: str, base_url: str, headers: dict, concurrency: int = 8, rate_limit: float = 20.0):
+        """Run every request of a batch and write its OpenAI-format results file"""
+        status = {**self.status(batch_id), "status": "in_progress", "in_progress_at": int(time.time())}
+        self._write_status(batch_id, status)
+        with open(self._path(batch_id, "input.jsonl"), encoding="utf-8") as f:
+            batch = [json.loads(line) for line in f if line.strip()]
+
+        bucket = TokenBucket(rate_limit)
+        url = chat_url(base_url)
+
+        def run(request):
+            try:
+                resp = post_with_backoff(request["body"], headers, url=url, bucket=bucket)
+                body = resp.json()
+            except Exception as e:
+                return {"id": f"batch_req_{uuid.uuid4().hex[:12]}", "custom_id": request["custom_id"],
+                        "response": None, "error": {"code": "request_failed", "message": str(e)}}
+            return {"id": f"batch_req_{uuid.uuid4().hex[:12]}", "custom_id": request["custom_id"],
+                    "response": {"status_code": resp.status_code, "body": body}, "error": None}
+
+        records = run_concurrently(batch, run, max_workers=concurrency)
+        with open(self._path(batch_id, "output.jsonl"), "w", encoding="utf-8") as f:
+            for record in records:
+                f.write(json.dumps(record) + "\n")
+        failed = sum(r["error"] is not None or r["response"]["status_code"] >= 400 for r in records)
+        self._write_status(batch_id, {
+            **status, "status": "completed", "completed_at": int(time.time()),
+            "request_counts": {"total": len(records), "completed": len(records) - failed, "failed": failed},
+        })
+
+
+def make_backend(kind: str, base_url: str = None, headers: dict = None, root: str = None):
+    if kind == "directory":
+        return DirectoryBatchBackend(root or os.path.join(BATCH_DIR, "local"))
+    return OpenAIBatchBackend(base_url, headers or {})
+
+
+def job_path(job_id: str, name: str = "", jobs_dir: str = BATCH_DIR) -> str:
+    return os.path.join(jobs_dir, "jobs", job_id, name)
+
+
+def new_job(jobs_dir: str = BATCH_DIR) -> str:
+    job_id = time.strftime("job_%Y%m%dT%H%M%S_", time.gmtime()) + uuid.uuid4().hex[:6]
+    os.makedirs(job_path(job_id, jobs_dir=jobs_dir))
+    return job_id
+
+
+def save_job(job_id: str, design_df: pd.DataFrame, settings: dict, jobs_dir: str = BATCH_DIR):
+    """Keep a submitted job's design and settings for collecting its results later"""
+    design_df.to_csv(job_path(job_id, "design.csv", jobs_dir), index=False)
+    with open(job_path(job_id, "job.json", jobs_dir), "w") as f:
+        json.dump({"job_id": job_id, "created_at": int(time.time()), **settings}, f, indent=2)
+
+
+def list_jobs(jobs_dir: str = BATCH_DIR) -> list:
+    """Saved jobs' settings, newest first"""
+    root = os.path.join(jobs_dir, "jobs")
+    if not os.path.isdir(root):
+        return []
+    jobs = []
+    for job_id in os.listdir(root):
+        try:
+            with open(os.path.join(root, job_id, "job.json")) as f:
+                jobs.append(json.load(f))
+        except (OSError, ValueError):
+            continue
+    return sorted(jobs, key=lambda j: j.get("created_at", 0), reverse=True)
+
+
+def load_job_design(job_id: str, jobs_dir: str = BATCH_DIR) -> pd.DataFrame:
+    return pd.read_csv(job_path(job_id, "design.csv", jobs_dir))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Local batch service worker")
+    sub = parser.add_subparsers(dest="command", required=True)
+    worker = sub.add_parser("worker", help="run pending batches in a directory")
+    worker.add_argument("root", nargs="?", default=os.path.join(BATCH_DIR, "local"))
+    worker.add_argument("--base-url", default=os.getenv("OPENAI_BASE_URL", "http://127.0.0.1:8010/v1"))
+    worker.add_argument("--concurrency", type=int, default=8)
+    worker.add_argument("--rate-limit", type=float, default=20.0)
+    worker.add_argument("--poll-seconds", type=float, default=2.0)
+    worker.add_argument("--once", action="store_true", help="process what is pending, then exit")
+    args = parser.parse_args()
+
+    backend = DirectoryBatchBackend(args.root)
+    headers = {"Authorization": f"Bearer {os.getenv('OPENAI_API_KEY', '')}"}
+    print(f"Watching {args.root} for batches, sending to {args.base_url}")
+    try:
+        while True:
+            for batch_id in backend.pending():
+                print(f"Processing {batch_id}")
+                backend.process(batch_id, args.base_url, headers, args.concurrency, args.rate_limit)
+            if args.once:
+                break
+            time.sleep(args.poll_seconds)
+    except KeyboardInterrupt:
+        pass
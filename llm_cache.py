@@ -0,0 +1,88 @@
+"""On-disk SQLite cache of chat-completion responses for the experiment scripts.
+
+A response is keyed by its endpoint and request payload (model, messages and
+every sampling parameter) plus the design row's replicate index, so re-running an
+unchanged design is served from disk and adding replicates only fetches the
+new rows. Failed calls are never cached.
+"""
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+CACHE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "llm_cache.sqlite")
+# Payload fields that change how a response is delivered, not what it says
+TRANSPORT_FIELDS = {"stream", "stream_options"}
+
+
+def cache_key(payload: dict, replicate: int, endpoint: str = "") -> str:
+    request = {k: v for k, v in payload.items() if k not in TRANSPORT_FIELDS}
+    blob = json.dumps({"endpoint": endpoint, "request": request, "replicate": int(replicate)}, sort_keys=True)
+    return hashlib.sha256(blob.encode()).hexdigest()
+
+
+class ResponseCache:
+    """Thread-safe response text store in one SQLite file
+
+    endpoint separates responses from different servers (e.g. a local mock).
+    """
+
+    def __init__(self, path: str = CACHE_PATH, endpoint: str = ""):
+        self.path = path
+        self.endpoint = endpoint
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            "key TEXT PRIMARY KEY, model TEXT, replicate INTEGER, request TEXT, text TEXT, created REAL)"
+        )
+        self._conn.commit()
+
+    def get(self, payload: dict, replicate: int):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT text FROM responses WHERE key = ?", (cache_key(payload, replicate, self.endpoint),)
+            ).fetchone()
+        return None if row is None else row[0]
+
+    def put(self, payload: dict, replicate: int, text: str):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?)",
+                (cache_key(payload, replicate, self.endpoint), payload.get("model"), int(replicate),
+                 json.dumps(payload, sort_keys=True), text, time.time()),
+            )
+            self._conn.commit()
+
+    def fetch(self, payload: dict, replicate: int, compute):
+        """(text, error, info) from the cache, or from compute(payload) and stored if it succeeded
+
+        info is {"cached": True} on a hit, otherwise whatever compute returned.
+        """
+        text = self.get(payload, replicate)
+        if text is not None:
+            with self._lock:
+                self.hits += 1
+            return text, None, {"cached": True}
+        with self._lock:
+            self.misses += 1
+        text, error, info = compute(payload)
+        if error is None:
+            self.put(payload, replicate, text)
+        return text, error, info
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM responses")
+            self._conn.commit()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+
+    def close(self):
+        self._conn.close()
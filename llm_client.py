@@ -0,0 +1,277 @@
+"""Concurrent, rate-limited chat-completion calls for the readability experiments.
+
+Design rows are sent from a thread pool; a shared token bucket caps the
+request rate, and 429/5xx responses are retried with exponential backoff
+(honouring Retry-After). Results come back in design-row order.
+
+The API base URL defaults to OPENAI_BASE_URL, or OpenAI's if that is unset;
+point it at llm_mock_server.py to run without network or keys.
+
+All calls share one pooled keep-alive session with connect/read timeouts.
+Each call reports how long it spent opening connections (zero when a pooled
+connection was reused) and its latency. Streamed (SSE) calls also report
+time to first token and output tokens per second.
+"""
+import json
+import os
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+from urllib3.util.retry import Retry
+
+OPENAI_BASE_URL = "https://api.openai.com/v1"
+DEFAULT_BASE_URL = os.getenv("OPENAI_BASE_URL", OPENAI_BASE_URL)
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+# (connect, read) seconds
+DEFAULT_TIMEOUT = (5.0, 60.0)
+POOL_SIZE = 16
+# Per-call timing fields and the result columns they are recorded under
+TIMING_COLUMNS = {
+    "latency_seconds": "LatencySeconds",
+    "ttft_seconds": "TTFTSeconds",
+    "tokens_per_second": "TokensPerSecond",
+    "output_tokens": "OutputTokens",
+    "connect_seconds": "ConnectSeconds",
+}
+
+_timing = threading.local()
+_session = None
+_session_lock = threading.Lock()
+
+
+def timing_summary(df) -> str:
+    """One-line latency and connection-reuse summary of a results frame; empty if nothing was timed"""
+    if not df["LatencySeconds"].notna().any():
+        return ""
+    connect = df["ConnectSeconds"]
+    return (f"API calls: mean latency {df['LatencySeconds'].mean():.2f}s, "
+            f"mean connect {connect.mean() * 1000:.0f}ms, "
+            f"{(connect > 0).sum()} of {connect.notna().sum()} opened a new connection")
+
+
+def chat_url(base_url: str = DEFAULT_BASE_URL) -> str:
+    return base_url.rstrip("/") + "/chat/completions"
+
+
+def needs_api_key(base_url: str) -> bool:
+    """Only the real API insists on a key; local stand-ins accept any"""
+    return "api.openai.com" in base_url
+
+
+class _TimedHTTPConnection(HTTPConnection):
+    def connect(self):
+        start = time.perf_counter()
+        super().connect()
+        _timing.connect = getattr(_timing, "connect", 0.0) + time.perf_counter() - start
+
+
+class _TimedHTTPSConnection(HTTPSConnection):
+    # Includes the TLS handshake
+    def connect(self):
+        start = time.perf_counter()
+        super().connect()
+        _timing.connect = getattr(_timing, "connect", 0.0) + time.perf_counter() - start
+
+
+class _TimedHTTPConnectionPool(HTTPConnectionPool):
+    ConnectionCls = _TimedHTTPConnection
+
+
+class _TimedHTTPSConnectionPool(HTTPSConnectionPool):
+    ConnectionCls = _TimedHTTPSConnection
+
+
+class PooledAdapter(HTTPAdapter):
+    """Keep-alive adapter whose connections record their setup time
+
+    Its retry policy only covers failures to connect, which never reach the
+    server. Responses such as 429/5xx are retried by post_with_backoff, so
+    every attempt passes through the rate limiter.
+    """
+
+    def __init__(self, pool_size: int = POOL_SIZE, connect_retries: int = 3):
+        retry = Retry(total=connect_retries, connect=connect_retries, read=0, status=0,
+                      backoff_factor=0.5, raise_on_status=False)
+        super().__init__(pool_connections=4, pool_maxsize=pool_size, max_retries=retry)
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            "http": _TimedHTTPConnectionPool,
+            "https": _TimedHTTPSConnectionPool,
+        }
+
+
+def make_session(pool_size: int = POOL_SIZE) -> requests.Session:
+    session = requests.Session()
+    adapter = PooledAdapter(pool_size)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+def get_session() -> requests.Session:
+    """Process-wide pooled session shared by every experiment call"""
+    global _session
+    with _session_lock:
+        if _session is None:
+            _session = make_session()
+        return _session
+
+
+class TokenBucket:
+    """Thread-safe token bucket: at most `rate` acquisitions per second, bursting to `capacity`"""
+
+    def __init__(self, rate: float, capacity: float = None):
+        self.rate = rate
+        self.capacity = capacity or max(rate, 1.0)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+
+def _retry_delay(attempt: int, response, base_delay: float, max_delay: float) -> float:
+    """Server's Retry-After if given, else exponential backoff with full jitter"""
+    if response is not None:
+        try:
+            return min(float(response.headers["Retry-After"]), max_delay)
+        except (KeyError, ValueError):
+            pass
+    return random.uniform(0, min(max_delay, base_delay * 2 ** attempt))
+
+
+def post_with_backoff(payload: dict, headers: dict, url: str = None, bucket: TokenBucket = None,
+                      max_retries: int = 5, base_delay: float = 1.0, max_delay: float = 30.0,
+                      session: requests.Session = None, timeout=DEFAULT_TIMEOUT, stream: bool = False):
+    """POST a chat completion, retrying 429/5xx responses, timeouts and connection errors
+
+    With stream=True the body of the returned response is left unread.
+    """
+    url = url or chat_url()
+    session = session or get_session()
+    for attempt in range(max_retries + 1):
+        if bucket is not None:
+            bucket.acquire()
+        response = None
+        try:
+            # Latency is measured from the last attempt, excluding backoff and rate limiting
+            _timing.sent = time.perf_counter()
+            response = session.post(url, headers=headers, json=payload, timeout=timeout, stream=stream)
+            # Out of retries, the caller gets the error response with its body unread
+            if response.status_code not in RETRY_STATUSES or attempt == max_retries:
+                return response
+            response.close()
+        except (requests.ConnectionError, requests.Timeout):
+            if attempt == max_retries:
+                raise
+        time.sleep(_retry_delay(attempt, response, base_delay, max_delay))
+
+
+def _read_stream(resp):
+    """(text, output tokens, time of first token) from an SSE chat-completion stream"""
+    parts, tokens, first = [], None, None
+    # Read to the end of the body, past [DONE], so the connection goes back to the pool
+    for line in resp.iter_lines():
+        data = line[5:].strip() if line.startswith(b"data:") else b""
+        if not data or data == b"[DONE]":
+            continue
+        chunk = json.loads(data)
+        if chunk.get("usage"):
+            tokens = chunk["usage"].get("completion_tokens")
+        for choice in chunk.get("choices", []):
+            content = choice.get("delta", {}).get("content")
+            if content:
+                if first is None:
+                    first = time.perf_counter()
+                parts.append(content)
+    # Without a usage chunk, count content deltas (about one token each)
+    return "".join(parts), tokens or len(parts), first
+
+
+def completion_text(payload: dict, headers: dict, stream: bool = False, **kwargs):
+    """(text, error, timing) for one chat completion; error is None on success
+
+    timing has connect_seconds (time spent opening connections, over all
+    attempts), latency_seconds (from sending the final attempt to the last
+    byte) and output_tokens. Streamed calls also fill in ttft_seconds and
+    tokens_per_second, the output rate after the first token.
+    """
+    _timing.connect = 0.0
+    _timing.sent = time.perf_counter()
+    nan = float("nan")
+    timing = {"connect_seconds": nan, "latency_seconds": nan, "ttft_seconds": nan,
+              "tokens_per_second": nan, "output_tokens": nan}
+    if stream:
+        payload = {**payload, "stream": True, "stream_options": {"include_usage": True}}
+    resp, data = None, {}
+    try:
+        resp = post_with_backoff(payload, headers, stream=stream, **kwargs)
+        if stream and resp.ok:
+            text, tokens, first = _read_stream(resp)
+            data = None
+        else:
+            data = resp.json()
+    except requests.RequestException as e:
+        timing["connect_seconds"] = _timing.connect
+        return "", f"API call failed: {e}", timing
+    except ValueError:
+        resp.close()
+    end = time.perf_counter()
+    timing["connect_seconds"] = _timing.connect
+    timing["latency_seconds"] = end - _timing.sent
+
+    if data is None:
+        timing["output_tokens"] = tokens
+        if first is not None:
+            timing["ttft_seconds"] = first - _timing.sent
+            if tokens > 1 and end > first:
+                timing["tokens_per_second"] = (tokens - 1) / (end - first)
+        return text, None, timing
+    if not resp.ok or "choices" not in data:
+        return "", f"API call failed (status {resp.status_code}): {data.get('error', data) or resp.reason}", timing
+    timing["output_tokens"] = data.get("usage", {}).get("completion_tokens", nan)
+    return data["choices"][0].get("message", {}).get("content", ""), None, timing
+
+
+def run_concurrently(items: list, fn, max_workers: int = 4, on_progress=None, on_result=None) -> list:
+    """fn(item) for every item on a thread pool, returned in input order
+
+    on_result(index, result) and on_progress(done, total) are called from the
+    calling thread as each call finishes, so they may update Streamlit
+    elements. If the caller is interrupted (e.g. Streamlit stops or reruns
+    the script from a callback), calls that have not started are cancelled.
+    """
+    results = [None] * len(items)
+    pool = ThreadPoolExecutor(max_workers=max_workers)
+    try:
+        futures = {pool.submit(fn, item): i for i, item in enumerate(items)}
+        for done, future in enumerate(as_completed(futures), start=1):
+            i = futures[future]
+            results[i] = future.result()
+            if on_result is not None:
+                on_result(i, results[i])
+            if on_progress is not None:
+                on_progress(done, len(items))
+    except BaseException:
+        pool.shutdown(wait=False, cancel_futures=True)
+        raise
+    pool.shutdown()
+    return results
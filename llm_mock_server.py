@@ -0,0 +1,255 @@
+"""Local stand-in for the OpenAI chat-completions endpoint.
+
+    python llm_mock_server.py --port 8010 --latency lognormal --latency-ms 400 --error-429 0.05
+
+then point an experiment's API base URL at http://127.0.0.1:8010/v1 (no key
+needed). Responses have the same JSON shape as the real API. Their text is
+generated deterministically from the request and from how many identical
+requests came before it, so replicates differ but a rerun reproduces them.
+Higher temperature and top_p give longer words and sentences, so the
+factorial experiments have effects to find. Latency and 429/500/timeout
+failures are injected at configurable rates.
+
+With "stream": true the reply is server-sent events, one word per chunk:
+the latency draw is the time to first token and --token-ms paces the rest.
+"""
+import argparse
+import hashlib
+import json
+import math
+import random
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+SIMPLE_WORDS = (
+    "we can test one thing at a time but that is slow so we change two or three at once and "
+    "look at what the runs tell us each set of runs shows how the parts work and when they "
+    "help or hurt the goal you get more from less work and you see which knob to turn first"
+).split()
+COMPLEX_WORDS = (
+    "factorial experimentation hyperparameter configuration optimization interaction "
+    "systematically statistical significance variability replication efficiency "
+    "generalization combinatorial dimensionality sensitivity characterization "
+    "orthogonality confounding randomization multifactorial methodology"
+).split()
+LATENCY_DISTRIBUTIONS = ("fixed", "uniform", "normal", "lognormal")
+
+
+def generate_text(payload: dict, occurrence: int, seed: int = 0) -> str:
+    """Deterministic response text for the occurrence-th identical request"""
+    request = json.dumps(payload, sort_keys=True)
+    rng = random.Random(f"{seed}:{request}:{occurrence}")
+    temperature = float(payload.get("temperature", 1.0))
+    top_p = float(payload.get("top_p", 1.0))
+    top_k = int(payload.get("top_k", len(SIMPLE_WORDS)))
+
+    p_complex = min(0.9, 0.05 + 0.2 * temperature + 0.1 * top_p)
+    sentence_mean = 6 + 10 * top_p
+    simple, complex_ = SIMPLE_WORDS[:max(top_k, 1)], COMPLEX_WORDS[:max(top_k, 1)]
+    n_words = min(int(payload.get("max_tokens", 200) * 0.75), rng.randint(60, 140))
+
+    sentences, words = [], []
+    for _ in range(n_words):
+        words.append(rng.choice(complex_ if rng.random() < p_complex else simple))
+        if len(words) >= max(3, rng.gauss(sentence_mean, 2)):
+            sentences.append(" ".join(words).capitalize() + ".")
+            words = []
+    if words:
+        sentences.append(" ".join(words).capitalize() + ".")
+    return " ".join(sentences)
+
+
+class MockChatHandler(BaseHTTPRequestHandler):
+    # Keep-alive, like the real API; every response carries a Content-Length
+    protocol_version = "HTTP/1.1"
+    # Set by make_server
+    config = None
+    state = None
+
+    def do_GET(self):
+        if self.path in ("/health", "/v1/health"):
+            self._send(200, {"status": "ok"})
+        elif self.path in ("/stats", "/v1/stats"):
+            with self.state["lock"]:
+                self._send(200, dict(self.state["counts"]))
+        else:
+            self._send(404, {"error": {"message": f"Unknown path {self.path}", "type": "invalid_request_error"}})
+
+    def do_POST(self):
+        if self.path.rstrip("/") not in ("/v1/chat/completions", "/chat/completions"):
+            self._send(404, {"error": {"message": f"Unknown path {self.path}", "type": "invalid_request_error"}})
+            return
+        try:
+            length = int(self.headers.get("Content-Length", 0))
+            payload = json.loads(self.rfile.read(length) or b"{}")
+        except ValueError:
+            self._send(400, {"error": {"message": "Request body must be JSON", "type": "invalid_request_error"}})
+            return
+        if "messages" not in payload:
+            self._send(400, {"error": {"message": "'messages' is required", "type": "invalid_request_error"}})
+            return
+
+        cfg, state = self.config, self.state
+        with state["lock"]:
+            roll = state["rng"].random()
+            delay = self._latency(state["rng"])
+            state["counts"]["requests"] += 1
+
+        if roll < cfg["error_timeout"]:
+            self._count("timeouts")
+            # Hang past any sane client read timeout, then drop the connection unanswered
+            time.sleep(cfg["hang_seconds"])
+            self.close_connection = True
+            return
+        roll -= cfg["error_timeout"]
+        time.sleep(delay)
+        if roll < cfg["error_429"]:
+            self._count("rate_limited")
+            self._send(429, {"error": {"message": "Rate limit reached", "type": "rate_limit_exceeded"}},
+                       {"Retry-After": str(cfg["retry_after"])})
+            return
+        roll -= cfg["error_429"]
+        if roll < cfg["error_500"]:
+            self._count("server_errors")
+            self._send(500, {"error": {"message": "The server had an error", "type": "server_error"}})
+            return
+
+        # Streaming changes how the text is delivered, not what it is
+        request = {k: v for k, v in payload.items() if k not in ("stream", "stream_options")}
+        key = hashlib.sha256(json.dumps(request, sort_keys=True).encode()).hexdigest()
+        with state["lock"]:
+            occurrence = state["seen"][key]
+            state["seen"][key] += 1
+            state["counts"]["completed"] += 1
+        text = generate_text(request, occurrence, cfg["seed"])
+        prompt_tokens = sum(len(str(m.get("content", "")).split()) for m in payload["messages"])
+        completion_tokens = math.ceil(len(text.split()) / 0.75)
+        usage = {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens,
+                 "total_tokens": prompt_tokens + completion_tokens}
+        if payload.get("stream"):
+            self._stream(payload, text, usage)
+            return
+        self._send(200, {
+            "id": f"chatcmpl-mock-{uuid.uuid4().hex[:12]}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": payload.get("model", "mock"),
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": text}, "finish_reason": "stop"}],
+            "usage": usage,
+        })
+
+    def _stream(self, payload: dict, text: str, usage: dict):
+        """Send text as chat.completion.chunk events over chunked transfer encoding"""
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        base = {"id": f"chatcmpl-mock-{uuid.uuid4().hex[:12]}", "object": "chat.completion.chunk",
+                "created": int(time.time()), "model": payload.get("model", "mock")}
+
+        def event(data):
+            body = f"data: {data if isinstance(data, str) else json.dumps(data)}\n\n".encode()
+            self.wfile.write(f"{len(body):x}\r\n".encode() + body + b"\r\n")
+            self.wfile.flush()
+
+        words = text.split(" ")
+        for i, word in enumerate(words):
+            if i and self.config["token_ms"]:
+                time.sleep(self.config["token_ms"] / 1000)
+            delta = {"content": word if i == 0 else " " + word}
+            if i == 0:
+                delta["role"] = "assistant"
+            event({**base, "choices": [{"index": 0, "delta": delta, "finish_reason": None}]})
+        event({**base, "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}]})
+        if payload.get("stream_options", {}).get("include_usage"):
+            event({**base, "choices": [], "usage": usage})
+        event("[DONE]")
+        self.wfile.write(b"0\r\n\r\n")
+
+    def _latency(self, rng: random.Random) -> float:
+        cfg = self.config
+        mean, sd = cfg["latency_ms"] / 1000, cfg["latency_sd"]
+        if cfg["latency"] == "uniform":
+            return rng.uniform(0, 2 * mean)
+        if cfg["latency"] == "normal":
+            return max(0.0, rng.gauss(mean, sd * mean))
+        if cfg["latency"] == "lognormal":
+            # latency_ms is the median; latency_sd is the sigma of the log
+            return rng.lognormvariate(math.log(max(mean, 1e-6)), sd)
+        return mean
+
+    def _count(self, name: str):
+        with self.state["lock"]:
+            self.state["counts"][name] += 1
+
+    def _send(self, status: int, payload: dict, headers: dict = None):
+        data = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class MockChatServer(ThreadingHTTPServer):
+    request_queue_size = 1024
+    daemon_threads = True
+
+    def handle_error(self, request, client_address):
+        # Clients hanging up, e.g. after a read timeout, are expected
+        if not isinstance(sys.exc_info()[1], ConnectionError):
+            super().handle_error(request, client_address)
+
+
+def make_server(host: str = "127.0.0.1", port: int = 8010, latency: str = "fixed",
+                latency_ms: float = 0.0, latency_sd: float = 0.5, error_429: float = 0.0,
+                error_500: float = 0.0, error_timeout: float = 0.0, hang_seconds: float = 120.0,
+                retry_after: float = 1.0, seed: int = 0, token_ms: float = 0.0) -> MockChatServer:
+    if latency not in LATENCY_DISTRIBUTIONS:
+        raise ValueError(f"latency must be one of {LATENCY_DISTRIBUTIONS}")
+    handler = type("MockChatCompletionsHandler", (MockChatHandler,), {
+        "config": {
+            "latency": latency, "latency_ms": latency_ms, "latency_sd": latency_sd,
+            "error_429": error_429, "error_500": error_500, "error_timeout": error_timeout,
+            "hang_seconds": hang_seconds, "retry_after": retry_after, "seed": seed,
+            "token_ms": token_ms,
+        },
+        "state": {"lock": threading.Lock(), "rng": random.Random(seed), "seen": Counter(), "counts": Counter()},
+    })
+    return MockChatServer((host, port), handler)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve a mock OpenAI chat-completions endpoint")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8010)
+    parser.add_argument("--latency", choices=LATENCY_DISTRIBUTIONS, default="fixed")
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="mean (median for lognormal) latency")
+    parser.add_argument("--latency-sd", type=float, default=0.5,
+                        help="relative sd for normal, log-sigma for lognormal")
+    parser.add_argument("--error-429", type=float, default=0.0, help="fraction of requests rate limited")
+    parser.add_argument("--error-500", type=float, default=0.0, help="fraction of requests failing with 500")
+    parser.add_argument("--error-timeout", type=float, default=0.0, help="fraction of requests left hanging")
+    parser.add_argument("--hang-seconds", type=float, default=120.0)
+    parser.add_argument("--retry-after", type=float, default=1.0)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--token-ms", type=float, default=0.0, help="delay between streamed tokens")
+    args = parser.parse_args()
+
+    server = make_server(args.host, args.port, args.latency, args.latency_ms, args.latency_sd,
+                         args.error_429, args.error_500, args.error_timeout, args.hang_seconds,
+                         args.retry_after, args.seed, args.token_ms)
+    print(f"Mock chat completions on http://{args.host}:{args.port}/v1")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
@@ -1,112 +1,183 @@
 import os
+import time
 import streamlit as st
 import pandas as pd
-import requests
 import numpy as np
-from textstat import flesch_reading_ease
 import statsmodels.api as sm
 from statsmodels.formula.api import ols
 import matplotlib.pyplot as plt
 import seaborn as sns
 
+from factorial_design import FACTORS, FactorialDesign, available_fractions
+from llm_batch import (
+    join_results, list_jobs, load_job_design, job_path, make_backend, new_job, read_results, save_job,
+    write_batch_file
+)
+from llm_cache import ResponseCache
+from llm_client import (
+    DEFAULT_BASE_URL, TIMING_COLUMNS, TokenBucket, chat_url, completion_text, needs_api_key, run_concurrently,
+    timing_summary
+)
+from online_anova import OnlineANOVA
+from readability import METRICS, score_text, score_texts, with_results
+from resampling import effect_resampling
+from sequential_design import STOP_REASONS, run_sequential
+
+# Seconds between refreshes of the interim ANOVA while responses arrive
+INTERIM_REFRESH_SECONDS = 0.5
+
 st.set_page_config(layout="wide")
 st.title("LLM Hyperparameters Experiment - Study of LLM Hyperparameters and Readability ")
 
 # Sidebar: settings
 st.sidebar.header("Experiment Settings")
-temps = st.sidebar.slider(
-    "Temperature (low ↔ high)",
-    0.0, 1.0, (0.2, 0.8), step=0.1
-)
-topp = st.sidebar.slider(
-    "Top-p (low ↔ high)",
-    0.0, 1.0, (0.1, 0.9), step=0.1
+mode = st.sidebar.radio("Mode", ["Live API calls", "Batch job"], horizontal=True)
+factor_names = st.sidebar.multiselect(
+    "Factors",
+    list(FACTORS),
+    # api.openai.com rejects top_k, so its default third factor is max_tokens
+    default=["Temperature", "TopP", "MaxTokens" if needs_api_key(DEFAULT_BASE_URL) else "TopK"]
 )
-topk = st.sidebar.slider(
-    "Top-k (low ↔ high)",
-    1, 200, (10, 100), step=1
+levels = {}
+for name in factor_names:
+    spec = FACTORS[name]
+    levels[name] = st.sidebar.slider(
+        f"{name} (low ↔ high)",
+        *spec["range"], spec["levels"], step=spec["step"]
+    )
+fraction = st.sidebar.selectbox(
+    "Design",
+    available_fractions(len(factor_names)),
+    format_func=lambda p: "Full factorial" if p == 0 else
+    f"2^({len(factor_names)}-{p}) fraction, resolution {FactorialDesign(levels, p).resolution}"
 )
+blocks = st.sidebar.selectbox("Blocks", [1, 2, 4])
+seed = st.sidebar.number_input("Run-order seed", 0, 1_000_000, 0, step=1)
+sequential = mode == "Live API calls" and st.sidebar.radio(
+    "Replication", ["Fixed", "Sequential"], horizontal=True,
+    help="Sequential runs one replicate at a time and stops once the effects are estimated precisely enough"
+) == "Sequential"
 r = st.sidebar.slider(
-    "Replicates per cell (r)",
+    "Maximum replicates per cell" if sequential else "Replicates per cell (r)",
     2, 8, 5, step=1
 )
-run = st.sidebar.button("Run Experiment")
-
-if run:
-    # 1) Build full 2×2×2×r design
-    grid = []
-    for T in [temps[0], temps[1]]:
-        for P in [topp[0], topp[1]]:
-            for K in [topk[0], topk[1]]:
-                for rep in range(r):
-                    grid.append({"Temperature": T, "TopP": P, "TopK": K})
-    df = pd.DataFrame(grid)
-    df["Flesch"] = np.nan
-
-    api_key = os.getenv("OPENAI_API_KEY")
-    if not api_key:
-        st.error("Set your OPENAI_API_KEY in the environment.")
-        st.stop()
-    headers = {"Authorization": f"Bearer {api_key}"}
-    progress = st.progress(0)
+if sequential:
+    target_half_width = st.sidebar.number_input(
+        "Target CI half-width (response units)",
+        0.0, 1000.0, 3.0, step=0.5
+    )
+    confidence = st.sidebar.selectbox("Confidence level", [0.90, 0.95, 0.99], index=1)
+    max_runs = st.sidebar.number_input(
+        "Call budget (runs)",
+        1, 10_000, 200, step=1
+    )
+base_url = st.sidebar.text_input("API base URL", value=DEFAULT_BASE_URL)
+if mode == "Batch job":
+    batch_backend = st.sidebar.selectbox(
+        "Batch service",
+        ["directory", "openai"],
+        format_func=lambda b: "Local directory (llm_batch.py worker)" if b == "directory" else "OpenAI Batch API"
+    )
+concurrency = st.sidebar.slider(
+    "Concurrent requests",
+    1, 16, 4, step=1
+)
+rate_limit = st.sidebar.number_input(
+    "Max requests per second",
+    0.1, 50.0, 5.0, step=0.5
+)
+stream = st.sidebar.checkbox("Stream responses (records time to first token)", value=False)
+# Batch results carry no per-call timings, so only the text metrics can be analysed
+response = st.sidebar.selectbox(
+    "ANOVA response",
+    list(METRICS) + (["LatencySeconds", "TTFTSeconds", "TokensPerSecond"] if mode == "Live API calls" else []),
+    format_func=lambda m: METRICS.get(m, m)
+)
+n_resamples = st.sidebar.number_input(
+    "Permutation / bootstrap resamples",
+    0, 100_000, 10_000, step=1000,
+    help="0 skips the resampling tests"
+)
+use_cache = st.sidebar.checkbox("Reuse cached responses", value=True)
+if st.sidebar.button("Clear response cache"):
+    ResponseCache().clear()
+run = st.sidebar.button("Run Experiment" if mode == "Live API calls" else "Submit Batch Job")
+stop = mode == "Live API calls" and st.sidebar.button("Stop and analyse collected runs")
 
-    # Loop & collect
-    for i, row in df.iterrows():
-        payload = {
-            "model": "gpt-4o-mini",
-            "messages": [
-                {"role": "system", "content": "You are a helpful assistant."},
-                {"role": "user",   "content": "Write a concise summary of the benefits of factorial experiments."}
-            ],
-            "temperature": float(row.Temperature),
-            "top_p":       float(row.TopP),
-            # so we record it as a factor only
-        }
-        resp = requests.post(
-            "https://api.openai.com/v1/chat/completions",
-            headers=headers, json=payload
-        )
-        if resp.ok:
-            js = resp.json()
-            txt = js["choices"][0]["message"]["content"]
-        else:
-            txt = ""
-            st.warning(f"Run {i+1} failed: {resp.status_code}")
+try:
+    design = FactorialDesign(levels, fraction, blocks)
+except ValueError as e:
+    st.sidebar.error(str(e))
+    st.stop()
+if sequential and max_runs < 2 * design.n_runs:
+    # Checked before Run, so no calls are paid for and then discarded
+    st.sidebar.error(f"The call budget of {max_runs} runs does not cover two replicates "
+                     f"of the {design.n_runs}-run design.")
+    st.stop()
+if "TopK" in factor_names and needs_api_key(base_url):
+    # Every call would fail with 400, so make none
+    st.sidebar.error("api.openai.com rejects top_k; use an endpoint that supports it, or drop the factor.")
+    st.stop()
+
+api_key = os.getenv("OPENAI_API_KEY", "")
+headers = {"Authorization": f"Bearer {api_key}"}
+base_payload = {
+    "model": "gpt-4o-mini",
+    "messages": [
+        {"role": "system", "content": "You are a helpful assistant."},
+        {"role": "user",   "content": "Write a concise summary of the benefits of factorial experiments."}
+    ],
+}
 
-        df.at[i, "Flesch"] = flesch_reading_ease(txt)
-        progress.progress((i + 1) / len(df))
 
+def analyse(df, design, response):
+    """Raw results, ANOVA, diagnostics and plots for a collected design"""
     # Convert to categorical for ANOVA
-    df["Temperature"] = pd.Categorical(
-        df.Temperature, 
-        categories=sorted(df.Temperature.unique()), 
-        ordered=True
-    )
-    df["TopP"] = pd.Categorical(
-        df.TopP, 
-        categories=sorted(df.TopP.unique()), 
-        ordered=True
-    )
-    df["TopK"] = pd.Categorical(
-        df.TopK, 
-        categories=sorted(df.TopK.unique()), 
-        ordered=True
-    )
+    for name in design.names:
+        df[name] = pd.Categorical(
+            df[name],
+            categories=sorted(df[name].unique()),
+            ordered=True
+        )
 
     # Show raw data
     st.subheader("Raw Results")
     st.dataframe(df)
 
-    # Fit three‐factor ANOVA
-    model = ols(
-        "Flesch ~ C(Temperature) * C(TopP) * C(TopK)", 
-        data=df
-    ).fit()
+    if df[response].isna().all():
+        st.error(f"No {response} values to analyse. Timings need fresh live calls "
+                 "(turn off the response cache); TTFT and tokens/sec also need streaming.")
+        return
+
+    # OLS needs every design point and some replication beyond them; otherwise stop at the running table
+    answered = df[df[response].notna()]
+    if answered.StdOrder.nunique() < design.n_runs or len(answered) <= design.n_runs:
+        st.warning(f"{answered.StdOrder.nunique()} of {design.n_runs} design points and {len(answered)} "
+                   f"{response} values: the full ANOVA and resampling need every design point and at least "
+                   "one replicate more; showing the running estimates.")
+        online = OnlineANOVA(design)
+        for std_order, value in zip(answered.StdOrder, answered[response]):
+            online.add(std_order, value)
+        st.subheader("Interim ANOVA")
+        st.dataframe(online.table())
+        return
+
+    # Fit every estimable effect of the design
+    model = ols(design.formula(response), data=design.coded_frame(df)).fit()
     anova = sm.stats.anova_lm(model, typ=2)
 
     st.subheader("ANOVA Table")
     st.dataframe(anova)
 
+    # Distribution-free check on the F tests, for bounded or skewed responses
+    if n_resamples:
+        st.subheader("Permutation & Bootstrap Inference")
+        start = time.perf_counter()
+        resampled = effect_resampling(design, df, response, int(n_resamples), seed=int(seed))
+        st.dataframe(resampled)
+        st.caption(f"{int(n_resamples):,} within-block permutations (Freedman–Lane) and bootstrap resamples "
+                   f"of each design point's replicates in {time.perf_counter() - start:.2f}s; 95% percentile intervals")
+
     # Diagnostic plots
     st.subheader("Diagnostics")
     fig, axes = plt.subplots(1, 2, figsize=(10,4))
@@ -117,39 +188,208 @@ if run:
     axes[1].set_title("Normal Q–Q")
     st.pyplot(fig)
 
-    # 7) Interaction plot faceted by TopK
-    st.subheader("Interaction Plot (faceted by Top-k)")
+    # 7) Interaction plot of the first two factors, faceted by the third
+    hue, x = design.names[0], design.names[1]
+    col = design.names[2] if len(design.names) > 2 else None
+    facet = f" by {col}" if col else ""
+    st.subheader(f"Interaction Plot{f' (faceted by {col})' if col else ''}")
     cat_int = sns.catplot(
         data=df,
-        x="TopP",
-        y="Flesch",
-        hue="Temperature",
-        col="TopK",
+        x=x,
+        y=response,
+        hue=hue,
+        col=col,
         kind="point",
         dodge=True,
         markers=["o", "s"],
         height=4,
         aspect=1
     )
-    cat_int.fig.suptitle("Temperature × Top-p Interaction by Top-k", y=1.02)
+    cat_int.fig.suptitle(f"{hue} × {x} Interaction{facet}", y=1.02)
     st.pyplot(cat_int.fig)
 
-    # 8) Box plot faceted by TopK
-    st.subheader("Boxplot: Flesch by Top-p, Temperature & Top-k")
+    # 8) Box plot faceted by the third factor
+    st.subheader(f"Boxplot: {response} by {x}, {hue}{f' & {col}' if col else ''}")
     cat_box = sns.catplot(
         data=df,
-        x="TopP",
-        y="Flesch",
-        hue="Temperature",
-        col="TopK",
+        x=x,
+        y=response,
+        hue=hue,
+        col=col,
         kind="box",
         height=4,
         aspect=1
     )
     cat_box.fig.suptitle(
-        "Flesch Scores by Top-p and Temperature (faceted by Top-k)",
+        f"{response} by {x} and {hue}{f' (faceted by {col})' if col else ''}",
         y=1.02
     )
     st.pyplot(cat_box.fig)
 
 
+def response_value(result, response):
+    """One call's value of the ANOVA response"""
+    txt, _, timing = result
+    if response in METRICS:
+        return score_text(txt)[response]
+    field = {column: key for key, column in TIMING_COLUMNS.items()}[response]
+    return timing.get(field, np.nan)
+
+
+def design_caption(design, n_runs):
+    st.caption(
+        f"{n_runs} runs: {design.n_runs} design points × {n_runs // design.n_runs} replicates"
+        + (f", resolution {design.resolution}" if design.resolution else "")
+        + (f", {design.blocks} blocks" if design.blocks > 1 else "")
+    )
+    with st.expander("Alias structure"):
+        st.dataframe(design.alias_table())
+
+
+if mode == "Live API calls" and run:
+    if not api_key and needs_api_key(base_url):
+        st.error("Set your OPENAI_API_KEY in the environment, or point the API base URL at a local server.")
+        st.stop()
+    progress = st.progress(0)
+    bucket = TokenBucket(rate_limit)
+    call = lambda payload: completion_text(payload, headers, stream=stream, url=chat_url(base_url), bucket=bucket)
+    cache = ResponseCache(endpoint=chat_url(base_url)) if use_cache else None
+    total_runs = min(r * design.n_runs, max_runs) if sequential else r * design.n_runs
+    collected = 0
+
+    # Effects refreshed as each response lands; the rows so far survive an operator stop
+    online = OnlineANOVA(design)
+    partial = st.session_state["partial"] = {"design": design, "response": response, "total": total_runs,
+                                             "rows": [], "results": []}
+    st.subheader("Interim ANOVA")
+    interim_caption, interim_table = st.empty(), st.empty()
+    last_refresh = 0.0
+
+    def show_interim():
+        global last_refresh
+        last_refresh = time.monotonic()
+        interim_caption.caption(f"{online.count} of {total_runs} {response} values; "
+                                "“Stop and analyse collected runs” ends the experiment here")
+        interim_table.dataframe(online.table())
+
+    def on_result(df, i, result):
+        online.add(df.StdOrder.iat[i], response_value(result, response))
+        partial["rows"].append(df.iloc[[i]])
+        partial["results"].append(result)
+        if time.monotonic() - last_refresh >= INTERIM_REFRESH_SECONDS:
+            show_interim()
+
+    def collect(df):
+        """Call the API for each design row; adds the readability and timing columns"""
+        global collected
+        # Collect concurrently; results come back in row order.
+        # Every factor is sent as its API parameter
+        payloads = [design.payload(row, base_payload) for row in df.itertuples()]
+        results = run_concurrently(
+            list(zip(payloads, df.Replicate)),
+            lambda job: cache.fetch(*job, call) if cache is not None else call(job[0]),
+            max_workers=concurrency,
+            on_progress=lambda done, total: progress.progress(min(1.0, (collected + done) / total_runs)),
+            on_result=lambda i, result: on_result(df, i, result),
+        )
+        collected += len(df)
+        for run_order, (txt, error, timing) in zip(df.RunOrder, results):
+            if error:
+                st.warning(f"Run {run_order} failed: {error}")
+        return with_results(df, results)
+
+    if sequential:
+        # Replicates one round at a time, refitting after each, until the effects are pinned down
+        st.subheader("Sequential Replication")
+        round_status, round_effects, round_chart = st.empty(), st.empty(), st.empty()
+
+        def show_round(df, effects, history):
+            round_status.write(
+                f"After {len(df)} runs ({history[-1]['Replicates']} replicates): widest "
+                f"{confidence:.0%} CI half-width {history[-1]['MaxHalfWidth']:.3g} (target {target_half_width:g})"
+            )
+            round_effects.dataframe(effects)
+            round_chart.line_chart(pd.DataFrame(history).set_index("Runs")["MaxHalfWidth"])
+
+        df, history, reason = run_sequential(
+            design, collect, response, target_half_width, confidence,
+            max_replicates=r, max_runs=int(max_runs), seed=int(seed), on_round=show_round
+        )
+        progress.progress(1.0)
+        st.info(f"Stopped after {len(df)} of at most {r * design.n_runs} runs: {STOP_REASONS[reason]}.")
+    else:
+        # 1) Build the design, with every replicate in randomised run order
+        df = collect(design.runs(r, seed=int(seed)))
+    show_interim()
+    st.session_state["partial"] = None
+    design_caption(design, len(df))
+    if cache is not None:
+        st.caption(f"Response cache: {cache.hits} reused, {cache.misses} fetched")
+        cache.close()
+    if timing_summary(df):
+        st.caption(timing_summary(df))
+    analyse(df, design, response)
+
+if mode == "Live API calls" and stop:
+    partial = st.session_state.get("partial")
+    if not partial or not partial["results"]:
+        st.info("No experiment is running.")
+    else:
+        # The interrupted run's responses so far, analysed as they are
+        st.session_state["partial"] = None
+        df = with_results(pd.concat(partial["rows"]), partial["results"])
+        st.warning(f"Stopped by the operator after {len(df)} of {partial['total']} runs.")
+        analyse(df, partial["design"], partial["response"])
+
+if mode == "Batch job":
+    if run:
+        # Write the whole design as one batch request file and hand it to the batch service
+        df = design.runs(r, seed=int(seed))
+        design_caption(design, len(df))
+        if batch_backend == "openai" and not api_key:
+            st.error("Set your OPENAI_API_KEY in the environment to use the OpenAI Batch API.")
+            st.stop()
+        job_id = new_job()
+        requests_path = job_path(job_id, "requests.jsonl")
+        write_batch_file(df, [design.payload(row, base_payload) for row in df.itertuples()], requests_path)
+        backend = make_backend(batch_backend, base_url, headers)
+        batch_id = backend.submit(requests_path)
+        save_job(job_id, df, {
+            "batch_id": batch_id, "backend": batch_backend, "base_url": base_url,
+            "levels": design.levels, "fraction": design.p, "blocks": design.blocks,
+        })
+        st.success(f"Submitted {len(df)} requests as {batch_id} (job {job_id}).")
+        with open(requests_path, "rb") as f:
+            st.download_button("Download batch JSONL", f.read(), file_name=f"{job_id}.jsonl")
+
+    # Results are collected whenever they are ready, in this or a later session
+    st.subheader("Collect Batch Results")
+    jobs = list_jobs()
+    if not jobs:
+        st.info("No batch jobs submitted yet.")
+    else:
+        job = st.selectbox(
+            "Job",
+            jobs,
+            format_func=lambda j: f"{j['job_id']} ({j['backend']}, {j['batch_id']})"
+        )
+        uploaded = st.file_uploader("Results JSONL (optional, instead of fetching)", type=["jsonl"])
+        if st.button("Check & Collect"):
+            if uploaded is not None:
+                lines = uploaded
+            else:
+                backend = make_backend(job["backend"], job["base_url"], headers)
+                status = backend.status(job["batch_id"])
+                st.write(f"Batch status: **{status['status']}**", status.get("request_counts", {}))
+                lines = backend.results(job["batch_id"])
+            if lines is None:
+                st.info("Results are not ready yet; check again later.")
+            else:
+                job_design = FactorialDesign(job["levels"], job["fraction"], job["blocks"])
+                df = join_results(load_job_design(job["job_id"]), read_results(lines))
+                design_caption(job_design, len(df))
+                for run_order, error in zip(df.RunOrder, df.Error):
+                    if pd.notna(error):
+                        st.warning(f"Run {run_order} failed: {error}")
+                df = pd.concat([df, score_texts(df.Text)], axis=1)
+                analyse(df.drop(columns=["Text", "Error"]), job_design, response)
@@ -0,0 +1,93 @@
+"""ANOVA of a two-level factorial design, updated one response at a time.
+
+    online = OnlineANOVA(design)
+    for std_order, value in responses_as_they_arrive:
+        online.add(std_order, value)
+        interim = online.table()
+
+Each design point (cell) keeps its count, mean and sum of squared
+deviations (Welford), and every effect's contrast of the cell means is
+adjusted as a cell mean moves, so add() costs O(number of effects) however
+many runs have come in. Once the design is balanced, table() gives the
+same sums of squares as anova_lm on design.formula() fitted to
+design.coded_frame(); while cells have unequal counts it uses the harmonic
+mean count (unweighted means).
+"""
+import math
+
+import numpy as np
+import pandas as pd
+from scipy import stats
+
+
+class OnlineANOVA:
+    """Cell sums for a 2^k or 2^(k-p) design and its running effects table"""
+
+    def __init__(self, design):
+        self.design = design
+        X = design.coded().astype(float)
+        self.masks = design.effects()
+        # (effects, cells) matrix of -1/+1 contrast coefficients
+        self.signs = np.array([
+            np.prod(X[:, [j for j in range(design.k) if mask >> j & 1]], axis=1) for mask in self.masks
+        ])
+        self.block = design.block_of(X) - 1
+        cells = design.n_runs
+        self.n = np.zeros(cells, dtype=np.int64)
+        self.mean = np.zeros(cells)
+        self.m2 = np.zeros(cells)
+        self.contrast = np.zeros(len(self.masks))
+        self.block_total = np.zeros(design.blocks)
+        self.inv_n = 0.0
+        self.filled = 0
+
+    @property
+    def count(self) -> int:
+        return int(self.n.sum())
+
+    def add(self, std_order: int, value: float):
+        """Record one response for the design point with this StdOrder; NaN is ignored"""
+        if value is None or not math.isfinite(value):
+            return
+        c = int(std_order) - 1
+        n = self.n[c] + 1
+        old_mean = self.mean[c]
+        delta = value - old_mean
+        self.mean[c] = old_mean + delta / n
+        self.m2[c] += delta * (value - self.mean[c])
+        moved = self.mean[c] - old_mean
+        self.contrast += self.signs[:, c] * moved
+        self.block_total[self.block[c]] += moved
+        if n == 1:
+            self.filled += 1
+        else:
+            self.inv_n -= 1 / (n - 1)
+        self.inv_n += 1 / n
+        self.n[c] = n
+
+    def table(self) -> pd.DataFrame:
+        """Effect estimates and ANOVA table; NaN until every design point has a response"""
+        cells = self.design.n_runs
+        names = [self.design.effect_name(m) for m in self.masks]
+        if self.filled < cells:
+            nan = np.full(len(names), np.nan)
+            return pd.DataFrame({"estimate": nan, "sum_sq": nan, "df": 1.0, "F": nan, "PR(>F)": nan}, index=names)
+
+        n_h = cells / self.inv_n
+        estimate = self.contrast / (cells / 2)
+        rows = pd.DataFrame({"estimate": estimate, "sum_sq": n_h * cells * estimate ** 2 / 4, "df": 1.0}, index=names)
+        if self.design.blocks > 1:
+            per_block = cells / self.design.blocks
+            block_means = self.block_total / per_block
+            ss = n_h * per_block * np.sum((block_means - block_means.mean()) ** 2)
+            rows = pd.concat([pd.DataFrame({"estimate": np.nan, "sum_sq": ss, "df": float(self.design.blocks - 1)},
+                                           index=["C(Block)"]), rows])
+        dof = self.count - cells
+        residual = pd.DataFrame({"estimate": np.nan, "sum_sq": self.m2.sum(), "df": float(dof)}, index=["Residual"])
+        if dof > 0:
+            mse = self.m2.sum() / dof
+            rows["F"] = rows["sum_sq"] / rows["df"] / mse
+            rows["PR(>F)"] = stats.f.sf(rows["F"], rows["df"], dof)
+        else:
+            rows["F"] = rows["PR(>F)"] = np.nan
+        return pd.concat([rows, residual])
@@ -0,0 +1,118 @@
+"""Batch readability scoring for experiment responses.
+
+    scores = score_texts(texts)          # DataFrame, one row per text
+    df = pd.concat([df, scores], axis=1)
+    df = with_results(design_rows, results)    # scores plus per-call timings of completion_text results
+
+Each text is tokenised once, the way textstat counts words and sentences,
+and every metric in METRICS is computed from the same word, sentence,
+syllable and letter counts; Flesch is rounded as textstat rounds it, so it
+equals textstat.flesch_reading_ease. Syllables (through textstat) and
+letters are counted once per distinct word and memoized, so the vocabulary
+the responses share is only hyphenated once per process. Corpora of at
+least PARALLEL_MIN_TEXTS texts are split into chunks across a process pool.
+Empty texts (failed calls) score NaN, which the ANOVA drops.
+"""
+import math
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+
+import pandas as pd
+from textstat import lexicon_count, remove_punctuation, syllable_count
+
+from llm_client import TIMING_COLUMNS
+
+# Column -> description; every column can be used as an ANOVA response
+METRICS = {
+    "Flesch": "Flesch reading ease (higher is easier)",
+    "FleschKincaidGrade": "Flesch-Kincaid grade level",
+    "GunningFog": "Gunning fog index",
+    "SMOG": "SMOG grade",
+    "ColemanLiau": "Coleman-Liau index",
+    "ARI": "Automated readability index",
+    "Words": "Word count",
+    "Sentences": "Sentence count",
+    "Syllables": "Syllable count",
+    "ComplexWords": "Words of three or more syllables",
+    "WordsPerSentence": "Mean words per sentence",
+    "SyllablesPerWord": "Mean syllables per word",
+}
+PARALLEL_MIN_TEXTS = 2000
+CHUNK_SIZE = 500
+
+# textstat's sentences; those of two words or fewer ("e.g.", "Dr.", "3.5") are not counted
+SENTENCE = re.compile(r"\b[^.!?]+[.!?]*")
+
+
+@lru_cache(maxsize=None)
+def word_counts(word: str) -> tuple:
+    """(syllables, letters) of a lower-case word"""
+    return max(1, syllable_count(word)), sum(c.isalnum() for c in word)
+
+
+def _round(number: float, points: int) -> float:
+    """Round half away from zero, as textstat does"""
+    p = 10 ** points
+    return math.floor(number * p + math.copysign(0.5, number)) / p
+
+
+def score_text(text: str) -> dict:
+    """Every metric in METRICS for one text"""
+    text = text or ""
+    words = remove_punctuation(text).split()
+    if not words:
+        return dict.fromkeys(METRICS, math.nan)
+    sentences = SENTENCE.findall(text)
+    n_words = len(words)
+    n_sentences = max(1, len(sentences) - sum(lexicon_count(s) <= 2 for s in sentences))
+    counts = [word_counts(w.lower()) for w in words]
+    n_syllables = sum(c[0] for c in counts)
+    complex_words = sum(c[0] >= 3 for c in counts)
+    letters = sum(c[1] for c in counts)
+
+    wps, spw = n_words / n_sentences, n_syllables / n_words
+    return {
+        "Flesch": _round(206.835 - 1.015 * _round(wps, 1) - 84.6 * _round(spw, 1), 2),
+        "FleschKincaidGrade": 0.39 * wps + 11.8 * spw - 15.59,
+        "GunningFog": 0.4 * (wps + 100 * complex_words / n_words),
+        "SMOG": 1.043 * math.sqrt(complex_words * 30 / n_sentences) + 3.1291,
+        "ColemanLiau": 0.0588 * 100 * letters / n_words - 0.296 * 100 * n_sentences / n_words - 15.8,
+        "ARI": 4.71 * letters / n_words + 0.5 * wps - 21.43,
+        "Words": n_words,
+        "Sentences": n_sentences,
+        "Syllables": n_syllables,
+        "ComplexWords": complex_words,
+        "WordsPerSentence": wps,
+        "SyllablesPerWord": spw,
+    }
+
+
+def _score_chunk(texts: list) -> list:
+    return [score_text(text) for text in texts]
+
+
+def score_texts(texts, processes: int = None) -> pd.DataFrame:
+    """METRICS columns for each text, in order
+
+    processes=1 always scores in this process; otherwise large corpora use a
+    pool of that many workers (default: one per CPU).
+    """
+    texts = list(texts)
+    workers = processes or os.cpu_count() or 1
+    if workers > 1 and len(texts) >= PARALLEL_MIN_TEXTS:
+        chunks = [texts[i:i + CHUNK_SIZE] for i in range(0, len(texts), CHUNK_SIZE)]
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            rows = [row for chunk in pool.map(_score_chunk, chunks) for row in chunk]
+    else:
+        rows = _score_chunk(texts)
+    return pd.DataFrame(rows, columns=list(METRICS))
+
+
+def with_results(df: pd.DataFrame, results) -> pd.DataFrame:
+    """Design rows with the METRICS scores and per-call timings of their (text, error, timing) results"""
+    scores = score_texts([text for text, _, _ in results])
+    # Per-call timings; NaN for responses served from the cache
+    timings = pd.DataFrame([timing for _, _, timing in results], columns=list(TIMING_COLUMNS))
+    return pd.concat([df.reset_index(drop=True), scores, timings.rename(columns=TIMING_COLUMNS)], axis=1)
@@ -0,0 +1,53 @@
+"""Sequential replication of a factorial design with early stopping.
+
+    df, history, reason = run_sequential(design, collect, "Flesch", target_half_width=3.0,
+                                         max_replicates=8, max_runs=40, seed=0)
+
+Instead of fixing the number of replicates up front, replicates are run one
+round at a time. After each round (from min_replicates on) every effect is
+refitted, and collection stops as soon as the widest effect confidence
+interval is within target_half_width. It also stops at max_replicates, or
+before a round that would go over max_runs calls. collect(round_df) runs one
+replicate's design rows and returns them with the response column filled in.
+"""
+import pandas as pd
+
+STOP_REASONS = {
+    "precision": "every effect's confidence interval is within the target",
+    "budget": "the next round would exceed the call budget",
+    "max_replicates": "the maximum number of replicates was reached",
+}
+
+
+def run_sequential(design, collect, response: str, target_half_width: float, confidence: float = 0.95,
+                   min_replicates: int = 2, max_replicates: int = 8, max_runs: int = None, seed=None,
+                   on_round=None) -> tuple:
+    """(collected runs, per-round history, stop reason)
+
+    on_round(df, effects, history) is called after each refit. Raises
+    ValueError, before collecting anything, when max_runs does not cover
+    min_replicates replicates.
+    """
+    if max_runs is not None and max_runs < min_replicates * design.n_runs:
+        raise ValueError(f"The call budget of {max_runs} runs does not cover {min_replicates} replicates "
+                         f"of the {design.n_runs}-run design")
+    frames, history = [], []
+    reason = "max_replicates"
+    for rep in range(max_replicates):
+        if max_runs is not None and (rep + 1) * design.n_runs > max_runs:
+            reason = "budget"
+            break
+        frames.append(collect(design.runs(1, seed=seed, first_replicate=rep)))
+        if rep + 1 < min_replicates:
+            continue
+        df = pd.concat(frames, ignore_index=True)
+        effects = design.effect_intervals(df, response, confidence)
+        widest = effects["half_width"].max()
+        history.append({"Replicates": rep + 1, "Runs": len(df), "MaxHalfWidth": widest})
+        if on_round:
+            on_round(df, effects, history)
+        if widest <= target_half_width:
+            reason = "precision"
+            break
+    df = pd.concat(frames, ignore_index=True) if frames else design.runs(0)
+    return df, pd.DataFrame(history), reason